@@ -0,0 +1,386 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileCopyrightText: 2025 David Carter <dcarter@davidcarter.ca>
+# SPDX-FileNotice: Part of the Woods addons.
+
+################################################################################
+#                                                                              #
+#   Copyright (c) 2025 David Carter <dcarter@davidcarter.ca>                   #
+#                                                                              #
+#   This addon is free software; you can redistribute it and/or modify it      #
+#   under the terms of the GNU Lesser General Public License as published      #
+#   by the Free Software Foundation; either version 2.1 of the License, or     #
+#   (at your option) any later version.                                        #
+#                                                                              #
+#   This addon is distributed in the hope that it will be useful,              #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of             #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       #
+#                                                                              #
+#   See the GNU Lesser General Public License for more details.                #
+#                                                                              #
+#   You should have received a copy of the GNU Lesser General Public License   #
+#   along with this addon; if not, write to the Free Software Foundation,      #
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA           #
+#                                                                              #
+################################################################################
+
+"""Benchmarks for the material generator"""
+
+__title__ = "FreeCAD Materials Generation Benchmarks"
+__author__ = "David Carter"
+__url__ = "https://www.davesrocketshop.com"
+
+from openpyxl import Workbook
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import cv2
+import json
+import numpy
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from base64 import b64encode
+from io import StringIO
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+import spreadsheet
+
+# Reading and parsing the workbook, then the stages timed by spreadsheet.processRow
+STAGES = ["load", "parse", "read", "hash", "mean", "png", "base64", "wrap+write"]
+# Columns of the processRow stages named for what they time in an inline card
+ROW_STAGES = {"encode": "base64", "write": "wrap+write"}
+
+def legacyTexture(encoded_output : str) -> str:
+    """The original wrapping loop, which copies the remainder on every line"""
+    base = " |-2"
+    while len(encoded_output) > 0:
+        base += "\n      "
+        base += encoded_output[:74]
+        encoded_output = encoded_output[74:]
+    base += "\n"
+    return base
+
+def legacyCard(row : dict, texture : str, diffuse : tuple) -> str:
+    yam = StringIO()
+    spreadsheet.writeCard(yam, row, None, diffuse)
+    return yam.getvalue() + '    TextureImage:' + legacyTexture(texture)
+
+def bestOf(repeat : int, function, *args) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def findRows(names : list[str]) -> list[dict]:
+    wanted = {name.lower() for name in names}
+    return [row for row in spreadsheet.readRows() if row["name"].lower() in wanted]
+
+def benchmarkWriter(names : list[str], repeat : int) -> None:
+    """Compare the string concatenating card writer with the streaming one"""
+    print(f"{'Card':<24}{'Texture':>12}{'Legacy (s)':>12}{'Stream (s)':>12}{'Speedup':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for row in findRows(names):
+            imageData = spreadsheet.readImage(row)
+            if imageData is None:
+                continue
+            png, diffuse, _ = spreadsheet.checkImage(imageData)
+            texture = b64encode(png).decode('ascii')
+            path = os.path.join(directory, f"{row['name']}.FCMat")
+
+            def writeLegacy():
+                with open(path, "w", encoding="utf-8") as outfile:
+                    outfile.write(legacyCard(row, texture, diffuse))
+
+            def writeStream():
+                with open(path, "w", encoding="utf-8") as outfile:
+                    spreadsheet.writeCard(outfile, row, texture, diffuse)
+
+            writeLegacy()
+            with open(path, "rb") as infile:
+                expected = infile.read()
+            writeStream()
+            with open(path, "rb") as infile:
+                if infile.read() != expected:
+                    raise RuntimeError(f"Streaming output differs for '{row['name']}'")
+
+            legacy = bestOf(repeat, writeLegacy)
+            stream = bestOf(repeat, writeStream)
+            print(f"{row['name']:<24}{len(texture):>12,}{legacy:>12.4f}{stream:>12.4f}{legacy / stream:>9.1f}x")
+
+def syntheticValues(index : int, rng : random.Random) -> list:
+    """A row of plausible values in the column layout of the real workbook"""
+    values = [None] * spreadsheet.COLUMN_MAX
+    softwood = rng.random() < 0.3
+    values[spreadsheet.COLUMN_NAME] = f"Synthetic {index:05d}"
+    values[spreadsheet.COLUMN_REF1] = f"https://www.wood-database.com/synthetic-{index}/"
+    values[spreadsheet.COLUMN_IMAGE] = f"synthetic-{index}.jpg"
+    values[spreadsheet.COLUMN_ALT_NAMES] = f"Alpha {index}, Beta {index}"
+    values[spreadsheet.COLUMN_SPECIES] = f"Genus species{index}"
+    values[spreadsheet.COLUMN_REF2] = f"https://en.wikipedia.org/wiki/Synthetic_{index}"
+    values[spreadsheet.COLUMN_SOFTWOOD] = softwood
+    values[spreadsheet.COLUMN_RANGE] = rng.choice(["US-E", "US-W, CA", "EU", "BR, SAM", "KE"])
+    values[spreadsheet.COLUMN_CITES] = rng.choice([None, None, None, "II"])
+    values[spreadsheet.COLUMN_IUCN_REDLIST] = rng.choice(["LC", "NT", "VU", "EN"])
+    values[spreadsheet.COLUMN_IUCN_REDLIST_URL] = f"https://www.iucnredlist.org/species/{index}/1"
+    values[spreadsheet.COLUMN_STEAM_BEND] = rng.choice(["?", round(rng.random(), 2)])
+    values[spreadsheet.COLUMN_HARDNESS] = rng.randint(1000, 20000)
+    values[spreadsheet.COLUMN_DENSITY] = rng.randint(300, 1200)
+    values[spreadsheet.COLUMN_FLEX_MODULUS] = rng.randint(5000, 20000)
+    number = spreadsheet.ROW_MIN + index
+    values[spreadsheet.COLUMN_SOUND_COEFFICIENT] = f"=SQRT(O{number}*10^6/N{number}^3)"
+    values[spreadsheet.COLUMN_FLEX_MOD_TANG_LONG] = rng.uniform(0.03, 0.08)
+    values[spreadsheet.COLUMN_FLEX_MOD_RAD_LONG] = rng.uniform(0.05, 0.15)
+    values[spreadsheet.COLUMN_SHEAR_LONG_RAD] = rng.uniform(0.05, 0.1)
+    values[spreadsheet.COLUMN_SHEAR_LONG_TANG] = rng.uniform(0.05, 0.1)
+    values[spreadsheet.COLUMN_SHEAR_RAD_TANG] = rng.uniform(0.005, 0.02)
+    values[spreadsheet.COLUMN_FLEX_STRENGTH] = rng.randint(50000, 200000)
+    values[spreadsheet.COLUMN_COMPRESS] = rng.randint(20000, 90000)
+    values[spreadsheet.COLUMN_COMPRESS_STRENGTH_CROSS] = rng.randint(2000, 15000)
+    values[spreadsheet.COLUMN_SHEAR_LONG] = rng.randint(5000, 20000)
+    values[spreadsheet.COLUMN_ULTIMATE_STRENGTH_LONG] = rng.randint(50000, 150000)
+    values[spreadsheet.COLUMN_ULTIMATE_STRENGTH_CROSS] = rng.randint(1000, 8000)
+    values[spreadsheet.COLUMN_POISSON_LONG_RAD] = rng.uniform(0.3, 0.45)
+    values[spreadsheet.COLUMN_POISSON_LONG_TANG] = rng.uniform(0.3, 0.5)
+    values[spreadsheet.COLUMN_POISSON_RAD_TANG] = rng.uniform(0.6, 0.8)
+    values[spreadsheet.COLUMN_POISSON_TANG_RAD] = rng.uniform(0.3, 0.5)
+    values[spreadsheet.COLUMN_POISSON_RAD_LONG] = rng.uniform(0.03, 0.06)
+    values[spreadsheet.COLUMN_POISSON_TANG_LONG] = rng.uniform(0.02, 0.04)
+    values[spreadsheet.COLUMN_MAX_LOAD] = rng.randint(50, 150)
+    values[spreadsheet.COLUMN_THERMAL_CONDUCTIVITY] = rng.uniform(0.1, 0.3)
+    values[spreadsheet.COLUMN_SHRINK_RAD] = rng.uniform(0.02, 0.06)
+    values[spreadsheet.COLUMN_SHRINK_TAN] = rng.uniform(0.04, 0.1)
+    values[spreadsheet.COLUMN_SHRINK_VOL] = rng.uniform(0.07, 0.16)
+    values[spreadsheet.COLUMN_UUID] = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    return values
+
+def syntheticImage(size : int, rng : random.Random) -> bytes:
+    """A JPG with a wood like grain, so it compresses like the real images"""
+    height = size * 2 // 3
+    x = numpy.arange(size, dtype=numpy.float32)
+    y = numpy.arange(height, dtype=numpy.float32)[:, None]
+    grain = numpy.sin(x / rng.uniform(2.0, 8.0) + numpy.sin(y / rng.uniform(20.0, 60.0)) * 3.0)
+    noise = numpy.random.default_rng(rng.getrandbits(32)).normal(0.0, 0.15, (height, size))
+    shade = (grain * 0.5 + noise + 1.5) / 3.0
+    color = numpy.array([rng.uniform(60, 200) for _ in range(3)], dtype=numpy.float32)
+    image = numpy.clip(shade[:, :, None] * color * 1.5, 0, 255).astype(numpy.uint8)
+    _, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+def createWorkbook(directory : str, species : int, imageSize : int, seed : int) -> str:
+    """Write a synthetic workbook and its images. Returns the workbook path"""
+    rng = random.Random(seed)
+    images = os.path.join(directory, "Images")
+    os.makedirs(images, exist_ok=True)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(spreadsheet.SHEET)
+    for _ in range(spreadsheet.ROW_MIN - 1):
+        ws.append(["header"])
+    for index in range(species):
+        values = syntheticValues(index, rng)
+        ws.append(values)
+        with open(os.path.join(images, values[spreadsheet.COLUMN_IMAGE]), "wb") as outfile:
+            outfile.write(syntheticImage(imageSize, rng))
+
+    filename = os.path.join(directory, "Properties.xlsx")
+    wb.save(filename)
+    return filename
+
+def peakRss() -> int | None:
+    """Peak resident set size of this process in bytes"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def runPipeline(species : int, imageSize : int, seed : int) -> dict:
+    """Time every stage of the generator on a synthetic workbook
+
+    The rows are built by the generator's own processRow, with every folder
+    it writes to moved into a temporary directory. This runs in a process of
+    its own, so the folders are left moved.
+    """
+    times = dict.fromkeys(STAGES, 0.0)
+    sizes = {"images": 0, "png": 0, "cards": 0}
+    policy = spreadsheet.TexturePolicy()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = createWorkbook(directory, species, imageSize, seed)
+        spreadsheet.IMAGES = os.path.join(directory, "Images")
+        spreadsheet.OUTPUT_DIR = os.path.join(directory, "Materials")
+        spreadsheet.TEXTURE_DIR = os.path.join(directory, "Textures")
+        spreadsheet.TEXTURE_STORE = os.path.join(directory, "Store")
+        spreadsheet.PREVIEW_DIR = os.path.join(directory, "Previews")
+        os.makedirs(spreadsheet.OUTPUT_DIR)
+
+        # What readRows does without its cache, with each step timed
+        start = time.perf_counter()
+        cells = spreadsheet.readCells(filename, spreadsheet.ROW_MIN + species - 1)
+        lap = time.perf_counter()
+        times["load"] = lap - start
+
+        rows = [spreadsheet.parseRow(row, links) for row, links in cells]
+        spreadsheet.properties.applyDerived(rows)
+        times["parse"] = time.perf_counter() - lap
+
+        for row in rows:
+            _, _, _, stats = spreadsheet.processRow(row, None, policy)
+            for stage, elapsed in stats["seconds"].items():
+                stage = ROW_STAGES.get(stage, stage)
+                times[stage] = times.get(stage, 0.0) + elapsed
+            sizes["images"] += stats.get("source", 0)
+            sizes["png"] += stats.get("png", 0)
+            sizes["cards"] += stats.get("card", 0)
+
+    return {
+        "species": species,
+        "imageSize": imageSize,
+        "seconds": times,
+        "total": sum(times.values()),
+        "bytes": sizes,
+        "peakRss": peakRss(),
+    }
+
+def benchmarkPipeline(counts : list[int], imageSize : int, seed : int, output : str | None) -> None:
+    """Run the pipeline benchmark for each workbook size in a fresh process"""
+    header = "".join(f"{stage:>11}" for stage in STAGES)
+    print(f"{'Species':>8}{header}{'Total':>9}{'Per row':>10}{'Peak RSS':>11}")
+    results = []
+    for species in counts:
+        # A new process for each size, so the peak RSS belongs to that size alone
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(runPipeline, species, imageSize, seed).result()
+        results.append(result)
+        stages = "".join(f"{result['seconds'][stage]:>11.3f}" for stage in STAGES)
+        rss = "" if result["peakRss"] is None else f"{result['peakRss'] / 2**20:.0f} MB"
+        print(f"{species:>8}{stages}{result['total']:>9.2f}{result['total'] / species * 1000:>8.2f}ms{rss:>11}")
+
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as outfile:
+            json.dump({"python": sys.version.split()[0], "results": results}, outfile, indent=2)
+            outfile.write("\n")
+
+# Stands in for FreeCAD, keeping the parameters in a JSON file between runs
+STUB_FREECAD = """
+import json, os
+
+_path = os.environ["WOODS_STUB_PARAMETERS"]
+try:
+    with open(_path, encoding="utf-8") as infile:
+        _groups = json.load(infile)
+except OSError:
+    _groups = {}
+writes = 0
+
+class _Group:
+    def __init__(self, values):
+        self.values = values
+    def GetString(self, name, default=""):
+        return self.values.get(name, default)
+    def SetString(self, name, value):
+        global writes
+        writes += 1
+        self.values[name] = value
+        with open(_path, "w", encoding="utf-8") as outfile:
+            json.dump(_groups, outfile)
+
+def ParamGet(path):
+    return _Group(_groups.setdefault(path, {}))
+"""
+
+# Run in a fresh interpreter to time the import of the addon
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import freecad.Woods
+seconds = time.perf_counter() - start
+import FreeCAD
+print(json.dumps({"seconds": seconds, "writes": FreeCAD.writes}))
+"""
+
+def runStartup(environment : dict) -> dict:
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], env=environment,
+                               capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout)
+    result["process"] = time.perf_counter() - start
+    return result
+
+def benchmarkStartup(runs : int, output : str | None) -> None:
+    """Time importing freecad.Woods against a stub FreeCAD module
+
+    The first run starts with no stored parameters, as on a new install.
+    The others find the values from the run before, as on every later start.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "FreeCAD.py"), "w", encoding="utf-8") as outfile:
+            outfile.write(STUB_FREECAD)
+        environment = dict(os.environ,
+                           PYTHONPATH=os.pathsep.join([directory, root]),
+                           WOODS_STUB_PARAMETERS=os.path.join(directory, "parameters.json"))
+        results = [runStartup(environment) for _ in range(runs + 1)]
+
+    print(f"{'Start':<8}{'Import (ms)':>12}{'Process (ms)':>14}{'Writes':>8}")
+    first, later = results[0], results[1:]
+    print(f"{'First':<8}{first['seconds'] * 1000:>12.1f}{first['process'] * 1000:>14.1f}{first['writes']:>8}")
+    if later:
+        seconds = statistics.median(result["seconds"] for result in later)
+        process = statistics.median(result["process"] for result in later)
+        writes = max(result["writes"] for result in later)
+        print(f"{'Later':<8}{seconds * 1000:>12.1f}{process * 1000:>14.1f}{writes:>8}")
+
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as outfile:
+            json.dump({"python": sys.version.split()[0], "results": results}, outfile, indent=2)
+            outfile.write("\n")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the material generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    writer = commands.add_parser("writer", help="compare the legacy and streaming card writers")
+    writer.add_argument("names", nargs="*", default=["Leopardwood", "Pheasantwood"],
+                        help="cards to benchmark the writer on")
+    writer.add_argument("--repeat", type=int, default=5,
+                        help="number of timed runs, the best is reported")
+
+    pipeline = commands.add_parser("pipeline", help="time each stage on synthetic workbooks")
+    pipeline.add_argument("--species", type=int, nargs="+", default=[250, 2500],
+                          help="number of species in each synthetic workbook (default 250 2500)")
+    pipeline.add_argument("--image-size", type=int, default=250, metavar="PIXELS",
+                          help="width of the generated JPGs (default 250)")
+    pipeline.add_argument("--seed", type=int, default=0,
+                          help="seed for the synthetic values and images")
+    pipeline.add_argument("--output", "-o", metavar="FILE",
+                          help="write the results as JSON")
+
+    startup = commands.add_parser("startup", help="time importing the addon against a stub FreeCAD")
+    startup.add_argument("--runs", type=int, default=20,
+                         help="number of later starts to time, the median is reported (default 20)")
+    startup.add_argument("--output", "-o", metavar="FILE",
+                         help="write the results as JSON")
+    args = parser.parse_args()
+
+    if args.command == "writer":
+        benchmarkWriter(args.names, args.repeat)
+    elif args.command == "startup":
+        benchmarkStartup(args.runs, args.output)
+    else:
+        benchmarkPipeline(args.species, args.image_size, args.seed, args.output)
+
+if __name__ == "__main__":
+    main()
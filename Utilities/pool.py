@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileCopyrightText: 2025 David Carter <dcarter@davidcarter.ca>
+# SPDX-FileNotice: Part of the Woods addons.
+
+################################################################################
+#                                                                              #
+#   Copyright (c) 2025 David Carter <dcarter@davidcarter.ca>                   #
+#                                                                              #
+#   This addon is free software; you can redistribute it and/or modify it      #
+#   under the terms of the GNU Lesser General Public License as published      #
+#   by the Free Software Foundation; either version 2.1 of the License, or     #
+#   (at your option) any later version.                                        #
+#                                                                              #
+#   This addon is distributed in the hope that it will be useful,              #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of             #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       #
+#                                                                              #
+#   See the GNU Lesser General Public License for more details.                #
+#                                                                              #
+#   You should have received a copy of the GNU Lesser General Public License   #
+#   along with this addon; if not, write to the Free Software Foundation,      #
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA           #
+#                                                                              #
+################################################################################
+
+
+"""Map a function over rows in worker processes"""
+
+__title__ = "FreeCAD Materials Generation"
+__author__ = "David Carter"
+__url__ = "https://www.davesrocketshop.com"
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
+
+def mapJobs(function : Callable, *iterables : Iterable, jobs : int = 1, chunksize : int = 1) -> Iterator[Any]:
+    """The results of function over the iterables, in order
+
+    With jobs == 1 it runs in this process. Otherwise the pool is shut down
+    when the results are exhausted, the caller stops early or a worker
+    raises.
+    """
+    if jobs == 1:
+        yield from map(function, *iterables)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(function, *iterables, chunksize=chunksize)
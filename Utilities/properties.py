@@ -0,0 +1,204 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileCopyrightText: 2025 David Carter <dcarter@davidcarter.ca>
+# SPDX-FileNotice: Part of the Woods addons.
+
+################################################################################
+#                                                                              #
+#   Copyright (c) 2025 David Carter <dcarter@davidcarter.ca>                   #
+#                                                                              #
+#   This addon is free software; you can redistribute it and/or modify it      #
+#   under the terms of the GNU Lesser General Public License as published      #
+#   by the Free Software Foundation; either version 2.1 of the License, or     #
+#   (at your option) any later version.                                        #
+#                                                                              #
+#   This addon is distributed in the hope that it will be useful,              #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of             #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       #
+#                                                                              #
+#   See the GNU Lesser General Public License for more details.                #
+#                                                                              #
+#   You should have received a copy of the GNU Lesser General Public License   #
+#   along with this addon; if not, write to the Free Software Foundation,      #
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA           #
+#                                                                              #
+################################################################################
+
+"""Columnar computation of the derived wood properties
+
+The parsed rows are loaded into one float64 array per property, with NaN
+wherever the spreadsheet has no usable value. Derived properties are then
+computed for every species at once, and propagate NaN where an input is
+missing.
+"""
+
+__title__ = "FreeCAD Materials Generation"
+__author__ = "David Carter"
+__url__ = "https://www.davesrocketshop.com"
+
+import numpy
+
+# The parsed row values the derived properties and checks are computed from
+COLUMNS = [
+    "density",
+    "flex_mod",
+    "shrink_rad",
+    "shrink_tan",
+    "shrink_vol",
+    "FlexModulusTangLong",
+    "FlexModulusRadLong",
+    "ShearLongRad",
+    "ShearLongTang",
+    "ShearRadTang",
+    "PoissonLongRad",
+    "PoissonLongTang",
+    "PoissonRadTang",
+    "PoissonTangRad",
+    "PoissonRadLong",
+    "PoissonTangLong",
+]
+
+# Largest relative difference allowed between the two sides of a check
+TOLERANCE = 0.25
+
+def toNumber(value) -> float:
+    # Empty, zero and text cells are all treated as missing, as the card
+    # writers have always done
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not value:
+        return numpy.nan
+    return float(value)
+
+def createTable(rows : list[dict], columns : list[str] = COLUMNS) -> dict[str, numpy.ndarray]:
+    """One array per column, with a value for every row"""
+    return {column : numpy.array([toNumber(row[column]) for row in rows], dtype=numpy.float64)
+            for column in columns}
+
+def deriveProperties(table : dict[str, numpy.ndarray]) -> dict[str, numpy.ndarray]:
+    """Compute every derived property for all species in one pass"""
+    young = table["flex_mod"]
+    radial = table["shrink_rad"]
+    tangential = table["shrink_tan"]
+    volume = table["shrink_vol"]
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        shrinkLong = 1 - (1 - volume) / ((1 - radial) * (1 - tangential))
+        return {
+            # NaN < 0 is false, so missing values stay missing
+            "ShrinkLong": numpy.where(shrinkLong < 0, 0.0, shrinkLong),
+            "SoundRadiationCoefficient": numpy.sqrt(young * 1e6 / table["density"] ** 3),
+            "ShearModulusLongRad": table["ShearLongRad"] * young,
+            "ShearModulusLongTan": table["ShearLongTang"] * young,
+            "ShearModulusRadTan": table["ShearRadTang"] * young,
+            "YoungsModulusTanLong": table["FlexModulusTangLong"] * young,
+            "YoungsModulusRadLong": table["FlexModulusRadLong"] * young,
+        }
+
+def relativeDifference(a : numpy.ndarray, b : numpy.ndarray) -> numpy.ndarray:
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        return numpy.abs(a - b) / numpy.maximum(numpy.abs(a), numpy.abs(b))
+
+def checkProperties(table : dict[str, numpy.ndarray]) -> dict[str, numpy.ndarray]:
+    """Consistency checks of the elastic constants across all species
+
+    Each check is an array of relative errors, NaN where the data needed is
+    missing. The compliance matrix of an orthotropic material is symmetric,
+    so nu_ij / E_i = nu_ji / E_j for each pair of directions. It must also be
+    positive definite, which requires nu_ij^2 < E_i / E_j, reported here as
+    the amount by which nu_ij^2 E_j / E_i exceeds one.
+    """
+    young = table["flex_mod"]
+    moduli = {
+        "Long": young,
+        "Rad": table["FlexModulusRadLong"] * young,
+        "Tang": table["FlexModulusTangLong"] * young,
+    }
+    checks = {}
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        for i, j in (("Long", "Rad"), ("Long", "Tang"), ("Rad", "Tang")):
+            forward = table[f"Poisson{i}{j}"]
+            reverse = table[f"Poisson{j}{i}"]
+            checks[f"Symmetry{i}{j}"] = relativeDifference(forward / moduli[i], reverse / moduli[j])
+            for (a, b), nu in (((i, j), forward), ((j, i), reverse)):
+                excess = nu ** 2 * moduli[b] / moduli[a] - 1
+                checks[f"Bound{a}{b}"] = numpy.maximum(excess, 0.0)
+    return checks
+
+def flagRows(checks : dict[str, numpy.ndarray], tolerance : float = TOLERANCE) -> list[list[str]]:
+    """The names of the checks failed by each row"""
+    names = list(checks)
+    if not names:
+        return []
+    failed = numpy.stack([checks[name] > tolerance for name in names], axis=1)
+    return [[name for name, fail in zip(names, row) if fail] for row in failed]
+
+# Voigt order of the elastic matrices: normal L, R, T then shear RT, LT, LR
+VOIGT = ["L", "R", "T", "RT", "LT", "LR"]
+
+def poissonPair(forward : numpy.ndarray, forwardModulus : numpy.ndarray,
+                reverse : numpy.ndarray, reverseModulus : numpy.ndarray) -> numpy.ndarray:
+    """The off diagonal compliance of a pair of directions
+
+    Measured ratios rarely satisfy nu_ij / E_i = nu_ji / E_j exactly, so the
+    two estimates are averaged to keep the matrix symmetric. If only one
+    ratio is known it is used alone.
+    """
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        estimates = numpy.stack([-forward / forwardModulus, -reverse / reverseModulus])
+    known = ~numpy.isnan(estimates)
+    total = numpy.where(known, estimates, 0.0).sum(axis=0)
+    count = known.sum(axis=0)
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        return numpy.where(count > 0, total / count, numpy.nan)
+
+def elasticMatrices(table : dict[str, numpy.ndarray]) -> dict[str, numpy.ndarray]:
+    """Orthotropic compliance and stiffness matrices of every species
+
+    Returns the (n, 6, 6) compliance in 1/MPa and stiffness in MPa, in VOIGT
+    order, with a "complete" mask of the rows that have every constant and a
+    "positiveDefinite" mask of those that are physically valid. Matrices of
+    incomplete rows are NaN.
+    """
+    young = table["flex_mod"]
+    radial = table["FlexModulusRadLong"] * young
+    tangential = table["FlexModulusTangLong"] * young
+    count = len(young)
+
+    compliance = numpy.zeros((count, 6, 6))
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        compliance[:, 0, 0] = 1 / young
+        compliance[:, 1, 1] = 1 / radial
+        compliance[:, 2, 2] = 1 / tangential
+        compliance[:, 3, 3] = 1 / (table["ShearRadTang"] * young)
+        compliance[:, 4, 4] = 1 / (table["ShearLongTang"] * young)
+        compliance[:, 5, 5] = 1 / (table["ShearLongRad"] * young)
+    pairs = {
+        (0, 1): poissonPair(table["PoissonLongRad"], young, table["PoissonRadLong"], radial),
+        (0, 2): poissonPair(table["PoissonLongTang"], young, table["PoissonTangLong"], tangential),
+        (1, 2): poissonPair(table["PoissonRadTang"], radial, table["PoissonTangRad"], tangential),
+    }
+    for (i, j), value in pairs.items():
+        compliance[:, i, j] = value
+        compliance[:, j, i] = value
+
+    complete = ~numpy.isnan(compliance).any(axis=(1, 2))
+    positiveDefinite = numpy.zeros(count, dtype=bool)
+    stiffness = numpy.full((count, 6, 6), numpy.nan)
+    compliance[~complete] = numpy.nan
+    if complete.any():
+        eigenvalues = numpy.linalg.eigvalsh(compliance[complete])
+        positiveDefinite[complete] = (eigenvalues > 0).all(axis=1)
+    if positiveDefinite.any():
+        inverse = numpy.linalg.inv(compliance[positiveDefinite])
+        # Remove the rounding asymmetry of the inversion
+        stiffness[positiveDefinite] = (inverse + inverse.transpose(0, 2, 1)) / 2
+    return {
+        "compliance": compliance,
+        "stiffness": stiffness,
+        "complete": complete,
+        "positiveDefinite": positiveDefinite,
+    }
+
+def applyDerived(rows : list[dict]) -> None:
+    """Add the derived properties to each parsed row, None where missing"""
+    derived = deriveProperties(createTable(rows))
+    for key, values in derived.items():
+        for row, value in zip(rows, values.tolist()):
+            row[key] = None if value != value else value
@@ -30,18 +30,85 @@ __author__ = "David Carter"
 __url__ = "https://www.davesrocketshop.com"
 
 from openpyxl import load_workbook
+from openpyxl.utils.cell import range_boundaries
+from xml.etree import ElementTree
 import os
+import posixpath
+import zipfile
 import uuid
-from typing import Any
+from typing import Any, TextIO
 import cv2
 from base64 import b64encode
 from PIL import Image
-from io import BytesIO
-import math
+from io import BytesIO, StringIO
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import asdict, dataclass
+from itertools import repeat
+from pathlib import Path
+import argparse
+import cProfile
+import csv
+import glob
+import hashlib
+import json
+import numpy
+import pickle
+import re
+import shutil
+import sys
+import struct
+import time
+import unicodedata
+import zlib
+
+import properties
+import validate
+from pool import mapJobs
 
 FILENAME = "Resources/Data/Properties.xlsx"
 IMAGES = "Resources/Data/Images"
 OUTPUT_DIR = "freecad/Woods/Resources/Materials"
+TEXTURE_DIR = "freecad/Woods/Resources/Textures"
+TEXTURE_STORE = "Resources/Data/Textures"
+PREVIEW_DIR = "freecad/Woods/Resources/Previews"
+PACK = "freecad/Woods/Resources/Materials.zip"
+MANIFEST = "Resources/Data/Manifest.json"
+LEDGER = "Resources/Data/UUIDs.json"
+ROW_CACHE = "Resources/Data/Rows.cache"
+CATALOG = "freecad/Woods/Resources/Catalog.json"
+ELASTICITY = "freecad/Woods/Resources/Elasticity.json"
+SEARCH = "freecad/Woods/Resources/Search.json"
+SHEET = "All"
+
+# Increment whenever a change to this file alters the generated cards. This
+# invalidates every entry in the build manifest.
+GENERATOR_VERSION = 1
+
+# Base64 characters per line of the embedded texture, and how many lines are
+# written at a time
+TEXTURE_WIDTH = 74
+TEXTURE_BATCH = 1024
+
+# Longest edges of the preview textures written by default
+PREVIEW_TIERS = (64, 256)
+
+# Seconds between checks for changed inputs in --watch mode
+WATCH_INTERVAL = 1.0
+
+@dataclass(frozen=True)
+class TexturePolicy:
+    """How source images are converted to embedded PNG textures
+
+    The defaults keep the original behaviour of a full resolution PNG saved
+    with the default PIL settings.
+    """
+    maxEdge : int | None = None       # Longest edge in pixels
+    colors : int | None = None        # Quantize to an adaptive palette
+    compressLevel : int | None = None # zlib level, 9 also optimizes
+    stripMetadata : bool = False      # Drop ICC profiles and other chunks
+    sidecar : bool = False            # Write to TEXTURE_DIR instead of inline
+    tiers : tuple[int, ...] = ()      # Longest edges of the previews in PREVIEW_DIR
+    deterministic : bool = False      # Canonical PNG encoding and colors
 
 ROW_MIN = 5
 ROW_MAX = 249
@@ -96,30 +163,28 @@ VlrBack = 0.376
 VrlTop = 0.048
 VlrTop = 0.386
 
-def parseURL(cell) -> str:
-    if cell.hyperlink:
-        return str(cell.hyperlink.target)
-    return cell.value
+def parseURL(value : Any, link : str | None) -> str:
+    if link:
+        return link
+    return value
 
-def parseSteam(cell) -> str | None:
-    if cell.value is None:
+def parseSteam(value : Any) -> str | None:
+    if value is None:
         return None
-    steam = cell.value
+    steam = value
     if steam == '?':
         return None
     return steam
     # return steam.strip("%")
 
-def parseBool(cell) -> bool:
-    value = cell.value
+def parseBool(value : Any) -> bool:
     if isinstance(value, bool):
         return value
     if value.lower() in ["true", "=true()",  "1"]:
         return True
     return False
 
-def parseCell(cell : Any) -> tuple[Any, bool]:
-    value = cell.value
+def parseCell(value : Any) -> tuple[Any, bool]:
     if value is None:
         return '', False
     if isinstance(value, str) and value.startswith("="):
@@ -140,52 +205,215 @@ def parseCell(cell : Any) -> tuple[Any, bool]:
 #         pass
 #     return 0
 
-def parseRow(row : tuple) -> dict:
+def parseRow(row : tuple, links : dict | None = None) -> dict:
+    """Parse a row of cell values
+
+    links maps column numbers to hyperlink targets. A missing UUID is left as
+    None for assignUuids to fill in.
+    """
+    links = links or {}
     result = {}
-    result["name"] = str(row[COLUMN_NAME].value).strip().title()
+    result["name"] = str(row[COLUMN_NAME]).strip().title()
     result["softwood"] = parseBool(row[COLUMN_SOFTWOOD])
     result["steam"] = parseSteam(row[COLUMN_STEAM_BEND])
-    result["hardness"] = row[COLUMN_HARDNESS].value
-    result["density"] = row[COLUMN_DENSITY].value
-    result["flex_mod"] = row[COLUMN_FLEX_MODULUS].value
-    result["flex_strength"] = row[COLUMN_FLEX_STRENGTH].value
-    result["compress"] = row[COLUMN_COMPRESS].value
-    result["shrink_rad"] = row[COLUMN_SHRINK_RAD].value
-    result["shrink_tan"] = row[COLUMN_SHRINK_TAN].value
-    result["shrink_vol"] = row[COLUMN_SHRINK_VOL].value
-    result["image"] = row[COLUMN_IMAGE].value
-    result["species"] = row[COLUMN_SPECIES].value
-    result["alt"] = row[COLUMN_ALT_NAMES].value
-    result["ref1"] = parseURL(row[COLUMN_REF1])
-    result["ref2"] = parseURL(row[COLUMN_REF2])
-    if row[COLUMN_UUID].value is None:
-        row[COLUMN_UUID].value = str(uuid.uuid4())
-    result["UUID"] = row[COLUMN_UUID].value
-    result["UUID2"] = row[COLUMN_UUID2].value
-    result["range"] = row[COLUMN_RANGE].value
-    result["CITES"] = row[COLUMN_CITES].value
-    result["Redlist"] = row[COLUMN_IUCN_REDLIST].value
-    result["RedlistURL"] = row[COLUMN_IUCN_REDLIST_URL].value
-    result["FlexModulusTangLong"] = row[COLUMN_FLEX_MOD_TANG_LONG].value
-    result["FlexModulusRadLong"] = row[COLUMN_FLEX_MOD_RAD_LONG].value
-    result["ShearLongRad"] = row[COLUMN_SHEAR_LONG_RAD].value
-    result["ShearLongTang"] = row[COLUMN_SHEAR_LONG_TANG].value
-    result["ShearRadTang"] = row[COLUMN_SHEAR_RAD_TANG].value
-    result["UltimateLong"] = row[COLUMN_ULTIMATE_STRENGTH_LONG].value
-    result["UltimateCross"] = row[COLUMN_ULTIMATE_STRENGTH_CROSS].value
-    result["CompressCross"] = row[COLUMN_COMPRESS_STRENGTH_CROSS].value
-    result["ShearLong"] = row[COLUMN_SHEAR_LONG].value
-    result["PoissonLongRad"] = row[COLUMN_POISSON_LONG_RAD].value
-    result["PoissonLongTang"] = row[COLUMN_POISSON_LONG_TANG].value
-    result["PoissonRadTang"] = row[COLUMN_POISSON_RAD_TANG].value
-    result["PoissonTangRad"] = row[COLUMN_POISSON_TANG_RAD].value
-    result["PoissonRadLong"] = row[COLUMN_POISSON_RAD_LONG].value
-    result["PoissonTangLong"] = row[COLUMN_POISSON_TANG_LONG].value
-    result["ThermalConductivity"] = row[COLUMN_THERMAL_CONDUCTIVITY].value
-    result["SoundCoefficient"] = row[COLUMN_SOUND_COEFFICIENT].value
-    result["MaxLoad"] = row[COLUMN_MAX_LOAD].value
+    result["hardness"] = row[COLUMN_HARDNESS]
+    result["density"] = row[COLUMN_DENSITY]
+    result["flex_mod"] = row[COLUMN_FLEX_MODULUS]
+    result["flex_strength"] = row[COLUMN_FLEX_STRENGTH]
+    result["compress"] = row[COLUMN_COMPRESS]
+    result["shrink_rad"] = row[COLUMN_SHRINK_RAD]
+    result["shrink_tan"] = row[COLUMN_SHRINK_TAN]
+    result["shrink_vol"] = row[COLUMN_SHRINK_VOL]
+    result["image"] = row[COLUMN_IMAGE]
+    result["species"] = row[COLUMN_SPECIES]
+    result["alt"] = row[COLUMN_ALT_NAMES]
+    result["ref1"] = parseURL(row[COLUMN_REF1], links.get(COLUMN_REF1))
+    result["ref2"] = parseURL(row[COLUMN_REF2], links.get(COLUMN_REF2))
+    result["UUID"] = row[COLUMN_UUID]
+    result["UUID2"] = row[COLUMN_UUID2]
+    result["range"] = row[COLUMN_RANGE]
+    result["CITES"] = row[COLUMN_CITES]
+    result["Redlist"] = row[COLUMN_IUCN_REDLIST]
+    result["RedlistURL"] = row[COLUMN_IUCN_REDLIST_URL]
+    result["FlexModulusTangLong"] = row[COLUMN_FLEX_MOD_TANG_LONG]
+    result["FlexModulusRadLong"] = row[COLUMN_FLEX_MOD_RAD_LONG]
+    result["ShearLongRad"] = row[COLUMN_SHEAR_LONG_RAD]
+    result["ShearLongTang"] = row[COLUMN_SHEAR_LONG_TANG]
+    result["ShearRadTang"] = row[COLUMN_SHEAR_RAD_TANG]
+    result["UltimateLong"] = row[COLUMN_ULTIMATE_STRENGTH_LONG]
+    result["UltimateCross"] = row[COLUMN_ULTIMATE_STRENGTH_CROSS]
+    result["CompressCross"] = row[COLUMN_COMPRESS_STRENGTH_CROSS]
+    result["ShearLong"] = row[COLUMN_SHEAR_LONG]
+    result["PoissonLongRad"] = row[COLUMN_POISSON_LONG_RAD]
+    result["PoissonLongTang"] = row[COLUMN_POISSON_LONG_TANG]
+    result["PoissonRadTang"] = row[COLUMN_POISSON_RAD_TANG]
+    result["PoissonTangRad"] = row[COLUMN_POISSON_TANG_RAD]
+    result["PoissonRadLong"] = row[COLUMN_POISSON_RAD_LONG]
+    result["PoissonTangLong"] = row[COLUMN_POISSON_TANG_LONG]
+    result["ThermalConductivity"] = row[COLUMN_THERMAL_CONDUCTIVITY]
+    result["SoundCoefficient"] = row[COLUMN_SOUND_COEFFICIENT]
+    result["MaxLoad"] = row[COLUMN_MAX_LOAD]
     return result
 
+def readHyperlinks(filename : str, sheet : str) -> dict[tuple[int, int], str]:
+    """Hyperlink targets of a worksheet keyed by (row, column), both 1 based
+
+    Read only workbooks don't expose hyperlinks, so they are read directly
+    from the relationship parts of the package.
+    """
+    main = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    officeRel = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+    packageRel = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+    def relationships(archive : zipfile.ZipFile, part : str) -> dict[str, str]:
+        folder, name = posixpath.split(part)
+        try:
+            root = ElementTree.fromstring(archive.read(f"{folder}/_rels/{name}.rels"))
+        except KeyError:
+            return {}
+        targets = {}
+        for rel in root.iter(f"{packageRel}Relationship"):
+            target = rel.get("Target")
+            if rel.get("TargetMode") != "External":
+                if target.startswith("/"):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join(folder, target))
+            targets[rel.get("Id")] = target
+        return targets
+
+    links = {}
+    with zipfile.ZipFile(filename) as archive:
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        parts = relationships(archive, "xl/workbook.xml")
+        part = None
+        for element in workbook.iter(f"{main}sheet"):
+            if element.get("name") == sheet:
+                part = parts[element.get(f"{officeRel}id")]
+        if part is None:
+            raise KeyError(f"Worksheet {sheet} does not exist.")
+        targets = relationships(archive, part)
+        with archive.open(part) as infile:
+            for _, element in ElementTree.iterparse(infile):
+                if element.tag == f"{main}hyperlink" and element.get(f"{officeRel}id") in targets:
+                    target = targets[element.get(f"{officeRel}id")]
+                    minCol, minRow, maxCol, maxRow = range_boundaries(element.get("ref"))
+                    for row in range(minRow, maxRow + 1):
+                        for column in range(minCol, maxCol + 1):
+                            links[(row, column)] = target
+                elif element.tag == f"{main}row":
+                    # Cell data isn't needed, so don't keep it in memory
+                    element.clear()
+    return links
+
+def readCells(filename : str = FILENAME, maxRow : int = ROW_MAX) -> list[tuple[tuple, dict]]:
+    """Stream the cell values of each row out of the workbook
+
+    Each row is returned with the hyperlinks of its reference columns.
+    """
+    hyperlinks = readHyperlinks(filename, SHEET)
+    wb = load_workbook(filename=filename, read_only=True)
+    try:
+        ws = wb[SHEET]
+        cells = []
+        for number, row in enumerate(ws.iter_rows(min_row=ROW_MIN, max_row=maxRow, max_col=COLUMN_MAX,
+                                                  values_only=True), ROW_MIN):
+            links = {column : hyperlinks[(number, column + 1)] for column in (COLUMN_REF1, COLUMN_REF2)
+                     if (number, column + 1) in hyperlinks}
+            cells.append((row, links))
+    finally:
+        wb.close()
+    return cells
+
+def rowCacheKey(filename : str, maxRow : int) -> str:
+    """Hash of the workbook and of the code that parses it"""
+    digest = hashlib.sha256()
+    digest.update(f"rows:{maxRow}\n".encode("utf-8"))
+    for path in (__file__, filename):
+        with open(path, "rb") as infile:
+            digest.update(hashlib.sha256(infile.read()).digest())
+    return digest.hexdigest()
+
+def loadRowCache(cache : str, key : str) -> list[dict] | None:
+    try:
+        with open(cache, "rb") as infile:
+            cached = pickle.load(infile)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("key") != key:
+        return None
+    return cached["rows"]
+
+def saveRowCache(cache : str, key : str, rows : list[dict]) -> None:
+    temporary = f"{cache}.{os.getpid()}"
+    with open(temporary, "wb") as outfile:
+        pickle.dump({"key": key, "rows": rows}, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, cache)
+
+def readRows(filename : str = FILENAME, maxRow : int = ROW_MAX, cache : str | None = ROW_CACHE) -> list[dict]:
+    """The parsed rows of the workbook, with their derived properties
+
+    The parsed rows are kept in cache, and openpyxl is only used when the
+    workbook or this file has changed since. Pass cache=None to always
+    read the workbook.
+    """
+    rows = None
+    if cache is not None:
+        key = rowCacheKey(filename, maxRow)
+        rows = loadRowCache(cache, key)
+    if rows is None:
+        rows = [parseRow(row, links) for row, links in readCells(filename, maxRow)]
+        if cache is not None:
+            saveRowCache(cache, key, rows)
+    properties.applyDerived(rows)
+    return rows
+
+def ledgerKey(row : dict) -> str:
+    return f"{row['name']}|{str(row['species'] or '').strip().title()}"
+
+def loadLedger() -> dict:
+    try:
+        with open(LEDGER, "r", encoding="utf-8") as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        return {}
+
+def saveLedger(ledger : dict) -> None:
+    with open(LEDGER, "w", encoding="utf-8") as outfile:
+        json.dump(dict(sorted(ledger.items())), outfile, indent=2)
+        outfile.write("\n")
+
+def assignUuids(rows : list[dict], ledger : dict) -> bool:
+    """Give every row without a UUID in the workbook one from the ledger
+
+    New UUIDs are added to the ledger. Returns True if the ledger changed.
+    """
+    changed = False
+    for row in rows:
+        if row["UUID"] is None:
+            key = ledgerKey(row)
+            if key not in ledger:
+                ledger[key] = str(uuid.uuid4())
+                changed = True
+            row["UUID"] = ledger[key]
+    return changed
+
+def syncUuids(filename : str, ledger : dict) -> int:
+    """Write UUIDs from the ledger into the workbook cells that are empty"""
+    wb = load_workbook(filename=filename, read_only=False)
+    ws = wb[SHEET]
+    count = 0
+    for row in ws.iter_rows(min_row=ROW_MIN, max_row=ROW_MAX, max_col=COLUMN_MAX):
+        if row[COLUMN_UUID].value is None:
+            parsed = parseRow(tuple(cell.value for cell in row))
+            key = ledgerKey(parsed)
+            if key in ledger:
+                row[COLUMN_UUID].value = ledger[key]
+                count += 1
+    if count > 0:
+        wb.save(filename=filename)
+    return count
+
 def getTags(row : dict) -> list:
     tags = []
     if row['alt']:
@@ -281,9 +509,8 @@ def createShrinkage(row : dict) -> str:
         yam += f'    ShrinkTangential: "{shrinkTangential * 100.0:.2f}"\n'
     if shrinkVolume:
         yam += f'    ShrinkVolume: "{shrinkVolume * 100.0:.2f}"\n'
-    if shrinkRadial and shrinkTangential and shrinkVolume:
-        shrinkLong = max(1 - (1 - shrinkVolume)/((1 - shrinkRadial)*(1 - shrinkTangential)), 0)
-        yam += f'    ShrinkLong: "{shrinkLong * 100.0:.2f}"\n'
+    if row["ShrinkLong"] is not None:
+        yam += f'    ShrinkLong: "{row["ShrinkLong"] * 100.0:.2f}"\n'
     return yam
 
 def createThermal(row : dict) -> str:
@@ -296,10 +523,8 @@ def createThermal(row : dict) -> str:
         return ""
 
 def createSound(row : dict) -> str:
-    density = row["density"]
-    young = row["flex_mod"]
-    if density and young:
-        coefficient = math.sqrt(young * 1e6 / math.pow(density, 3))
+    coefficient = row["SoundRadiationCoefficient"]
+    if coefficient is not None:
         yam =   '  Sound:\n'
         yam +=  '    UUID: "6b7f44ab-e48d-4568-98aa-1d88a8b6e57d"\n'
         yam += f'    SoundRadiationCoefficient: "{coefficient:.1f} m^4/kg/s"\n'
@@ -347,19 +572,19 @@ def createWood(row : dict) -> str:
         yam += f'    PoissonRatioTanLong: "{row["PoissonTangLong"]:.3f}"\n'
     if row["ShearLong"]:
         yam += f'    ShearStrengthLong: "{row["ShearLong"]:.2f} kPa"\n'
-    if row["ShearLongRad"] and row["flex_mod"]:
-        yam += f'    ShearModulusLongRad: "{row["ShearLongRad"] * row["flex_mod"]:.2f} MPa"\n'
-    if row["ShearLongTang"] and row["flex_mod"]:
-        yam += f'    ShearModulusLongTan: "{row["ShearLongTang"] * row["flex_mod"]:.2f} MPa"\n'
-    if row["ShearRadTang"] and row["flex_mod"]:
-        yam += f'    ShearModulusRadTan: "{row["ShearRadTang"] * row["flex_mod"]:.2f} MPa"\n'
+    if row["ShearModulusLongRad"] is not None:
+        yam += f'    ShearModulusLongRad: "{row["ShearModulusLongRad"]:.2f} MPa"\n'
+    if row["ShearModulusLongTan"] is not None:
+        yam += f'    ShearModulusLongTan: "{row["ShearModulusLongTan"]:.2f} MPa"\n'
+    if row["ShearModulusRadTan"] is not None:
+        yam += f'    ShearModulusRadTan: "{row["ShearModulusRadTan"]:.2f} MPa"\n'
     if row["flex_mod"]:
         yam += f'    YoungsModulus: "{row["flex_mod"]:.2f} MPa"\n'
         yam += f'    YoungsModulusLong: "{row["flex_mod"]:.2f} MPa"\n'
-    if row["FlexModulusTangLong"] and row["flex_mod"]:
-        yam += f'    YoungsModulusTanLong: "{row["FlexModulusTangLong"] * row["flex_mod"]:.2f} MPa"\n'
-    if row["FlexModulusRadLong"] and row["flex_mod"]:
-        yam += f'    YoungsModulusRadLong: "{row["FlexModulusRadLong"] * row["flex_mod"]:.2f} MPa"\n'
+    if row["YoungsModulusTanLong"] is not None:
+        yam += f'    YoungsModulusTanLong: "{row["YoungsModulusTanLong"]:.2f} MPa"\n'
+    if row["YoungsModulusRadLong"] is not None:
+        yam += f'    YoungsModulusRadLong: "{row["YoungsModulusRadLong"]:.2f} MPa"\n'
     if row["UltimateLong"]:
         yam += f'    UltimateTensileStrength: "{row["UltimateLong"]:.2f} kPa"\n'
         yam += f'    UltimateStrengthLong: "{row["UltimateLong"]:.2f} kPa"\n'
@@ -376,7 +601,7 @@ def createWood(row : dict) -> str:
         yam += f'    WorkToMaximumLoad: "{row["MaxLoad"]:.2f} kJ/m^3"\n'
     return yam
 
-def createAppearance(base : str | None, diffuse : tuple) ->str:
+def createAppearance(diffuse : tuple, texturePath : str | None = None) ->str:
     yam =   "AppearanceModels:\n"
     yam +=  "  Texture Rendering:\n"
     yam +=  '    UUID: "bbdcc65b-67ca-489c-bd5c-a36e33d1c160"\n'
@@ -386,11 +611,11 @@ def createAppearance(base : str | None, diffuse : tuple) ->str:
     yam +=  '    Shininess: "0.9"\n'
     yam +=  '    SpecularColor: "(0.533333, 0.533333, 0.533333, 1)"\n'
     yam +=  '    Transparency: "0"\n'
-    if base is not None:
-        yam += '    TextureImage:' + base
+    if texturePath is not None:
+        yam += f'    TexturePath: "{texturePath}"\n'
     return yam
 
-def createYaml(row : dict, base : str | None, diffuse : tuple, averaged : bool = False) -> str:
+def createGeneral(row : dict, averaged : bool = False) -> str:
     yam = ""
     yam += "# SPDX-License-Identifier: CDLA-Sharing-1.0\n"
     yam += "# SPDX-FileCopyrightText: 2025 Gregory Holmberg\n"
@@ -420,96 +645,1064 @@ def createYaml(row : dict, base : str | None, diffuse : tuple, averaged : bool =
         yam += '    \n'
         yam += '    This file includes averaged values in the absence of known values.\n'
         yam += '    Use with caution as the values may produce incorrect results.\n'
-    yam += createInherits(row)
-
-    yam += 'Models:\n'
-    yam += createBotanical(row)
-    # yam += createMachinability(row)
-    yam += createHardness(row)
-    yam += createShrinkage(row)
-    yam += createThermal(row)
-    yam += createSound(row)
-    # yam += createLinearElastic(row) #- produces bad results for poisson ratio
-    yam += createWood(row)
-    yam += createAppearance(base, diffuse)
-
     return yam
 
-def createCard(row : dict, base : str | None, diffuse : tuple) -> None:
+# The physical models of every card, in the order they are written
+MODELS = [
+    createBotanical,
+    # createMachinability,
+    createHardness,
+    createShrinkage,
+    createThermal,
+    createSound,
+    # createLinearElastic, #- produces bad results for poisson ratio
+    createWood,
+]
+
+def writeTexture(outfile : TextIO, texture : str) -> None:
+    """Write the base64 texture as a block scalar wrapped at TEXTURE_WIDTH
+
+    Lines are sliced straight out of the encoded string and written in
+    batches, so time and memory are linear in the size of the texture.
+    """
+    outfile.write('    TextureImage: |-2')
+    batch = TEXTURE_WIDTH * TEXTURE_BATCH
+    for start in range(0, len(texture), batch):
+        stop = min(start + batch, len(texture))
+        outfile.write("".join(["\n      " + texture[i:i + TEXTURE_WIDTH]
+                               for i in range(start, stop, TEXTURE_WIDTH)]))
+    outfile.write("\n")
+
+def writeCard(outfile : TextIO, row : dict, texture : str | None, diffuse : tuple, averaged : bool = False,
+              texturePath : str | None = None) -> None:
+    """Stream a complete card to outfile one section at a time"""
+    outfile.write(createGeneral(row, averaged))
+    outfile.write(createInherits(row))
+
+    outfile.write('Models:\n')
+    for createModel in MODELS:
+        outfile.write(createModel(row))
+    outfile.write(createAppearance(diffuse, texturePath))
+    if texture is not None:
+        writeTexture(outfile, texture)
+
+def createYaml(row : dict, texture : str | None, diffuse : tuple, averaged : bool = False) -> str:
+    yam = StringIO()
+    writeCard(yam, row, texture, diffuse, averaged)
+    return yam.getvalue()
+
+def parseModel(yam : str) -> tuple[dict, dict]:
+    """Read the properties back out of a model section
+
+    Returns the property values and the units of those that are quantities.
+    Values are parsed from the text written to the card, so the catalog holds
+    exactly what the cards contain.
+    """
+    values = {}
+    units = {}
+    key = None
+    for line in yam.splitlines():
+        if line.startswith('      - '):
+            values[key].append(line[8:].strip('"'))
+            continue
+        match = re.fullmatch(r'    (\w+):(?: "(.*)")?', line)
+        if match is None:
+            continue
+        key, text = match.groups()
+        if key == "UUID":
+            continue
+        if text is None:
+            values[key] = []
+        elif key.endswith("Units") and key[:-len("Units")] in values:
+            units[key[:-len("Units")]] = text
+        elif text in ("True", "False"):
+            values[key] = text == "True"
+        else:
+            number, _, unit = text.partition(" ")
+            try:
+                values[key] = float(number)
+                if unit:
+                    units[key] = unit
+            except ValueError:
+                if number != "None":
+                    values[key] = text
+    return values, units
+
+def createCatalog(rows : list[dict]) -> str:
+    """Every material with its identity and the properties written to its card
+
+    One material per line, so the file stays small and diffs well.
+    """
+    units = {}
+    materials = []
+    for row in rows:
+        if row["name"] is None:
+            continue
+        material = {"UUID": row["UUID"], "UUID2": row["UUID2"], "Name": row["name"]}
+        for createModel in MODELS:
+            values, modelUnits = parseModel(createModel(row))
+            material.update(values)
+            units.update(modelUnits)
+        materials.append(material)
+    lines = ['{"version":1,',
+             f'"units":{json.dumps(dict(sorted(units.items())), ensure_ascii=False, separators=(",", ":"))},',
+             '"materials":[']
+    lines.append(",\n".join(json.dumps(material, ensure_ascii=False, separators=(",", ":"))
+                            for material in materials))
+    lines.append(']}\n')
+    return "\n".join(lines)
+
+def writeIfChanged(filename : str, text : str) -> bool:
+    """Write text to filename unless it already holds it. Returns True if written"""
+    try:
+        with open(filename, "r", encoding="utf-8") as infile:
+            if infile.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(filename, "w", encoding="utf-8", newline="\n") as outfile:
+        outfile.write(text)
+    return True
+
+def createElasticity(rows : list[dict]) -> str:
+    """The compliance and stiffness matrices of every material with a full set of constants
+
+    The matrices are flattened row by row, in the order of properties.VOIGT.
+    Materials whose compliance isn't positive definite have no stiffness.
+    """
+    matrices = properties.elasticMatrices(properties.createTable(rows))
+    materials = []
+    for index, row in enumerate(rows):
+        if row["name"] is None or not matrices["complete"][index]:
+            continue
+        positive = bool(matrices["positiveDefinite"][index])
+        material = {
+            "Name": row["name"],
+            "PositiveDefinite": positive,
+            "Compliance": matrices["compliance"][index].ravel().tolist(),
+            "Stiffness": matrices["stiffness"][index].ravel().tolist() if positive else None,
+        }
+        materials.append(f'{json.dumps(row["UUID"])}:{json.dumps(material, ensure_ascii=False, separators=(",", ":"))}')
+    lines = ['{"version":1,',
+             '"units":{"Compliance":"1/MPa","Stiffness":"MPa"},',
+             f'"order":{json.dumps(properties.VOIGT, separators=(",", ":"))},',
+             '"materials":{']
+    lines.append(",\n".join(materials))
+    lines.append('}}\n')
+    return "\n".join(lines)
+
+def normalizeName(text : str) -> str:
+    """Lower case words without accents or punctuation
+
+    freecad/Woods/Search.py normalizes queries the same way.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text).split())
+
+def nameTrigrams(text : str) -> set[str]:
+    """The trigrams of each word, padded with two spaces before and one after"""
+    trigrams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+def searchTerms(row : dict) -> list[tuple[str, str]]:
+    """The (field, text) pairs a material can be found by"""
+    terms = [("name", row["name"])]
+    terms += [("alias", tag) for tag in getTags(row)]
+    if row["species"]:
+        terms.append(("species", row["species"].strip().title()))
+    if row["range"]:
+        terms += [("range", code) for code in getRange(row)]
+    return terms
+
+def createSearchIndex(rows : list[dict]) -> str:
+    """A trigram index over the names, aliases, species and range codes
+
+    Each term is [material, field, normalized text], and each trigram lists
+    the terms that contain it in ascending order.
+    """
+    materials = []
+    terms = []
+    postings = {}
+    for row in rows:
+        if row["name"] is None:
+            continue
+        seen = set()
+        for field, text in searchTerms(row):
+            text = normalizeName(text)
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            for trigram in nameTrigrams(text):
+                postings.setdefault(trigram, []).append(len(terms))
+            terms.append([len(materials), field, text])
+        materials.append(row["UUID"])
+    compact = {"ensure_ascii": False, "separators": (",", ":")}
+    lines = ['{"version":1,',
+             f'"materials":{json.dumps(materials, **compact)},',
+             '"terms":[']
+    lines.append(",\n".join(json.dumps(term, **compact) for term in terms))
+    lines.append('],')
+    lines.append(f'"trigrams":{json.dumps(dict(sorted(postings.items())), **compact)}}}\n')
+    return "\n".join(lines)
+
+def referencedTextures(cards : list[str]) -> list[str]:
+    """The sidecar textures the cards reference that exist"""
+    textures = {cardTexture(card) for card in cards} - {None}
+    return sorted(texture for texture in textures if os.path.exists(texture))
+
+def pruneSidecars() -> int:
+    """Remove the textures in TEXTURE_DIR that no card references. Returns the number removed"""
+    if not os.path.isdir(TEXTURE_DIR):
+        return 0
+    keep = {os.path.normpath(texture) for texture in referencedTextures(glob.glob(f"{OUTPUT_DIR}/*.FCMat"))}
+    removed = 0
+    for path in glob.glob(f"{TEXTURE_DIR}/*.png"):
+        if os.path.normpath(path) not in keep:
+            os.remove(path)
+            removed += 1
+    return removed
+
+def packFiles() -> list[tuple[str, str]]:
+    """The (path, name in the pack) of every card, of the textures they reference and of the previews"""
+    resources = os.path.dirname(OUTPUT_DIR)
+    cards = sorted(glob.glob(f"{OUTPUT_DIR}/*.FCMat"))
+    previews = sorted(glob.glob(f"{PREVIEW_DIR}/*/*.png"))
+    return [(path, os.path.relpath(path, resources).replace(os.sep, "/"))
+            for path in cards + referencedTextures(cards) + previews]
+
+def writePack(filename : str = PACK) -> bool:
+    """Write the cards to a zip archive unless it already holds them
+
+    The archive is reproducible, and its comment is the hash of its contents
+    so the addon can tell when it needs extracting again. Returns True if
+    it was written.
+    """
+    files = packFiles()
+    digest = hashlib.sha256()
+    for path, name in files:
+        with open(path, "rb") as infile:
+            digest.update(f"{name}\n".encode("utf-8"))
+            digest.update(hashlib.sha256(infile.read()).digest())
+    comment = digest.hexdigest().encode("ascii")
+    try:
+        with zipfile.ZipFile(filename) as archive:
+            if archive.comment == comment:
+                return False
+    except (OSError, zipfile.BadZipFile):
+        pass
+
+    temporary = f"{filename}.{os.getpid()}"
+    with zipfile.ZipFile(temporary, "w") as archive:
+        for path, name in files:
+            # A fixed date keeps the archive the same for the same cards
+            info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(path, "rb") as infile:
+                archive.writestr(info, infile.read(), compresslevel=9)
+        archive.comment = comment
+    os.replace(temporary, filename)
+    return True
+
+def writeCatalog(rows : list[dict]) -> bool:
+    """Write the catalog if it changed. Returns True if it was written"""
+    return writeIfChanged(CATALOG, createCatalog(rows))
+
+@contextmanager
+def timed(stats : dict | None, stage : str):
+    """Add the time spent in the block to the stage in stats["seconds"]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            seconds = stats.setdefault("seconds", {})
+            seconds[stage] = seconds.get(stage, 0.0) + time.perf_counter() - start
+
+def sidecarPath(png : bytes) -> str:
+    return f"{TEXTURE_DIR}/{hashlib.sha256(png).hexdigest()}.png"
+
+def writeSidecar(png : bytes) -> str:
+    """Store a texture in TEXTURE_DIR under the hash of its contents
+
+    Returns the path of the texture relative to the card.
+    """
+    path = sidecarPath(png)
+    if not os.path.exists(path):
+        os.makedirs(TEXTURE_DIR, exist_ok=True)
+        # Workers may store the same texture at the same time
+        temporary = f"{path}.{os.getpid()}"
+        with open(temporary, "wb") as outfile:
+            outfile.write(png)
+        os.replace(temporary, path)
+    return os.path.relpath(path, OUTPUT_DIR).replace(os.sep, "/")
+
+def createCard(row : dict, png : bytes | None, diffuse : tuple, sidecar : bool = False,
+               stats : dict | None = None) -> None:
     name = row["name"]
     if name is not None:
+        texture = None
+        texturePath = None
+        if png is not None:
+            with timed(stats, "encode"):
+                if sidecar:
+                    texturePath = writeSidecar(png)
+                else:
+                    texture = b64encode(png).decode('ascii')
+            if stats is not None:
+                stats["texture"] = len(texture or "")
+
         # if row["averaged"]:
-        #     yaml = createYaml(row, base, diffuse, True)
         #     outputName = f"{OUTPUT_DIR}/{name} (Averaged).FCMat"
-        #     outfile = open(outputName, "w", encoding="utf-8")
-        #     outfile.write(yaml)
-        #     outfile.close()
+        #     with open(outputName, "w", encoding="utf-8") as outfile:
+        #         writeCard(outfile, row, texture, diffuse, True, texturePath)
 
-        yaml = createYaml(row, base, diffuse, False)
-        outputName = f"{OUTPUT_DIR}/{name}.FCMat"
-        outfile = open(outputName, "w", encoding="utf-8")
-        outfile.write(yaml)
-        outfile.close()
+        outputName = cardPath(row)
+        with timed(stats, "write"):
+            with open(outputName, "w", encoding="utf-8") as outfile:
+                writeCard(outfile, row, texture, diffuse, False, texturePath)
+        if stats is not None:
+            stats["card"] = os.path.getsize(outputName)
 
-def imageToPng(imageData : bytes) -> bytes:
-    # Create an in-memory binary stream for the input JPG data
-    imageBuffer = BytesIO(imageData)
+# PNG color types of the image modes written by canonicalPng
+PNG_COLOR_TYPES = {"L": 0, "RGB": 2, "P": 3, "LA": 4, "RGBA": 6}
 
-    # Open the image using Pillow
-    img = Image.open(imageBuffer)
+def pngChunk(kind : bytes, data : bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def canonicalPng(img : Image.Image, level : int = 6) -> bytes:
+    """A PNG of only the pixels, the same bytes for the same pixels
+
+    Unlike PIL, whose output varies between versions and carries metadata,
+    this writes just the header, palette and one data chunk. Each row uses
+    the filter with the least sum of absolute differences, as libpng does,
+    except palette rows which aren't filtered.
+    """
+    if img.mode not in PNG_COLOR_TYPES:
+        img = img.convert("RGB")
+    pixels = numpy.asarray(img, dtype=numpy.uint8)
+    height, width = pixels.shape[:2]
+    depth = 1 if pixels.ndim == 2 else pixels.shape[2]
+    x = pixels.reshape(height, width * depth).astype(numpy.int16)
+
+    if img.mode == "P":
+        choice = numpy.zeros(height, dtype=numpy.uint8)
+        rows = x
+    else:
+        # Left, up and upper left neighbours of each byte
+        a = numpy.zeros_like(x)
+        a[:, depth:] = x[:, :-depth]
+        b = numpy.zeros_like(x)
+        b[1:] = x[:-1]
+        c = numpy.zeros_like(x)
+        c[1:, depth:] = x[:-1, :-depth]
+        p = a + b - c
+        pa, pb, pc = numpy.abs(p - a), numpy.abs(p - b), numpy.abs(p - c)
+        paeth = numpy.where((pa <= pb) & (pa <= pc), a, numpy.where(pb <= pc, b, c))
+        # None, Sub, Up, Average and Paeth, in PNG filter type order
+        filtered = numpy.stack([x, x - a, x - b, x - (a + b) // 2, x - paeth]) % 256
+        cost = numpy.where(filtered > 127, 256 - filtered, filtered).sum(axis=2)
+        choice = cost.argmin(axis=0).astype(numpy.uint8)
+        rows = filtered[choice, numpy.arange(height)]
+
+    data = numpy.hstack([choice[:, None], rows.astype(numpy.uint8)]).tobytes()
+    png = b"\x89PNG\r\n\x1a\n"
+    png += pngChunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, PNG_COLOR_TYPES[img.mode], 0, 0, 0))
+    if img.mode == "P":
+        count = int(pixels.max()) + 1
+        png += pngChunk(b"PLTE", bytes(img.getpalette()[:3 * count]))
+    png += pngChunk(b"IDAT", zlib.compress(data, level))
+    png += pngChunk(b"IEND", b"")
+    return png
+
+def encodePng(img : Image.Image, policy : TexturePolicy = TexturePolicy()) -> bytes:
+    if policy.colors is not None:
+        img = img.convert("RGB").quantize(colors=policy.colors)
+    if policy.deterministic:
+        return canonicalPng(img, 6 if policy.compressLevel is None else policy.compressLevel)
+    if policy.stripMetadata:
+        img.info.clear()
+    options = {}
+    if policy.compressLevel is not None:
+        options["compress_level"] = policy.compressLevel
+        options["optimize"] = policy.compressLevel >= 9
 
     # Create an in-memory binary stream for the output PNG data
     pngBuffer = BytesIO()
 
     # Save the image as PNG to the output buffer
-    img.save(pngBuffer, format="PNG")
+    img.save(pngBuffer, format="PNG", **options)
 
     # Get the bytes data of the PNG image
-    pngData = pngBuffer.getvalue()
+    return pngBuffer.getvalue()
+
+def openImage(imageData : bytes, policy : TexturePolicy = TexturePolicy()) -> Image.Image:
+    """Decode an image with Pillow and scale it down as the policy requires"""
+    # Create an in-memory binary stream for the input JPG data
+    imageBuffer = BytesIO(imageData)
+
+    # Open the image using Pillow
+    img = Image.open(imageBuffer)
+
+    # Apply the texture policy
+    if policy.maxEdge is not None and max(img.size) > policy.maxEdge:
+        img.thumbnail((policy.maxEdge, policy.maxEdge), Image.Resampling.LANCZOS)
+    img.load()
+    return img
+
+def encodeImage(img : Image.Image, policy : TexturePolicy = TexturePolicy(),
+                tiers : dict | None = None) -> bytes:
+    """Encode a decoded image as PNG following the policy
+
+    If tiers is given, it is filled with a PNG for each of policy.tiers,
+    scaled down from the same image. Tiers at least as large as the image
+    are the full PNG.
+    """
+    pngData = encodePng(img, policy)
+
+    if tiers is not None:
+        for size in policy.tiers:
+            if max(img.size) > size:
+                tier = img.copy()
+                tier.thumbnail((size, size), Image.Resampling.LANCZOS)
+                tiers[size] = encodePng(tier, policy)
+            else:
+                tiers[size] = pngData
 
     return pngData
 
-def checkImage(data : dict) -> tuple[str | None, Any]:
-    base = None
-    diffuse = (0.859, 0.780, 0.584, 1)
+def textureStats(stats : dict | None, imageData : bytes, png : bytes, img : Image.Image) -> None:
+    if stats is not None:
+        stats["source"] = len(imageData)
+        stats["png"] = len(png)
+        stats["width"], stats["height"] = img.size
+
+def imageToPng(imageData : bytes, policy : TexturePolicy = TexturePolicy(), stats : dict | None = None,
+               tiers : dict | None = None) -> bytes:
+    """Encode an image as PNG following the policy, see encodeImage"""
+    img = openImage(imageData, policy)
+    pngData = encodeImage(img, policy, tiers)
+    textureStats(stats, imageData, pngData, img)
+    return pngData
+
+def readImage(data : dict) -> bytes | None:
     if data["image"] is not None:
         image = f"{IMAGES}/{data['image']}"
         if os.path.exists(image):
-            im = cv2.imread(image)
+            with open(image, "rb") as image_file:
+                return image_file.read()
+        print(f"Missing image '{image}'")
+    return None
+
+# The entries of Image.info that PIL writes to a PNG
+PNG_METADATA = ["icc_profile", "transparency"]
+
+def textureKey(img : Image.Image, policy : TexturePolicy = TexturePolicy()) -> str:
+    """Hash of everything encodePng writes: the pixels, the metadata kept and the policy"""
+    digest = hashlib.sha256()
+    digest.update(f"generator:{GENERATOR_VERSION}\n".encode("utf-8"))
+    digest.update(json.dumps(asdict(policy), sort_keys=True).encode("utf-8"))
+    digest.update(f"{img.mode} {img.size}\n".encode("utf-8"))
+    digest.update(img.tobytes())
+    if img.mode == "P":
+        digest.update(bytes(img.getpalette() or []))
+    if not (policy.stripMetadata or policy.deterministic):
+        for name in PNG_METADATA:
+            value = img.info.get(name)
+            if value is not None:
+                digest.update(f"\n{name}:".encode("utf-8"))
+                digest.update(value if isinstance(value, bytes) else repr(value).encode("utf-8"))
+    return digest.hexdigest()
+
+def storedTexture(key : str) -> bytes | None:
+    try:
+        with open(f"{TEXTURE_STORE}/{key}.png", "rb") as infile:
+            return infile.read()
+    except OSError:
+        return None
+
+def storedTiers(key : str, policy : TexturePolicy = TexturePolicy()) -> dict[int, bytes] | None:
+    """The stored previews of a texture, None unless every tier is stored"""
+    tiers = {}
+    for size in policy.tiers:
+        tiers[size] = storedTexture(f"{key}-{size}")
+        if tiers[size] is None:
+            return None
+    return tiers
+
+def storeTexture(key : str, png : bytes) -> None:
+    os.makedirs(TEXTURE_STORE, exist_ok=True)
+    path = f"{TEXTURE_STORE}/{key}.png"
+    # Workers may store the same texture at the same time
+    temporary = f"{path}.{os.getpid()}"
+    with open(temporary, "wb") as outfile:
+        outfile.write(png)
+    os.replace(temporary, path)
+
+def pruneStore(keys : set[str]) -> int:
+    """Remove the textures and previews in TEXTURE_STORE whose key is not in keys
+
+    Returns the number of files removed.
+    """
+    if not os.path.isdir(TEXTURE_STORE):
+        return 0
+    removed = 0
+    for entry in os.scandir(TEXTURE_STORE):
+        # Previews are stored as <key>-<size>.png
+        if entry.name.split(".")[0].split("-")[0] not in keys:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+def checkImage(imageData : bytes | None, policy : TexturePolicy = TexturePolicy(),
+               stats : dict | None = None, store : bool = True) -> tuple[bytes | None, Any, dict[int, bytes]]:
+    """The PNG texture, mean color and preview tiers of an image
+
+    Textures are kept in TEXTURE_STORE by the hash of the decoded image and
+    the metadata written with it, so an image is only encoded once however
+    many cards use it, or if another file holds the same image. With
+    store=False it is always encoded and the store is left alone.
+    """
+    png = None
+    diffuse = (0.859, 0.780, 0.584, 1)
+    tiers = {}
+    if imageData is not None:
+        with timed(stats, "mean"):
+            im = cv2.imdecode(numpy.frombuffer(imageData, numpy.uint8), cv2.IMREAD_COLOR)
             A = cv2.mean(im)
 
-            # BGR to RGB
-            diffuse = (A[2] / 255.0, A[1] / 255.0, A[0] / 255.0, 1.0)
+        # BGR to RGB
+        diffuse = (A[2] / 255.0, A[1] / 255.0, A[0] / 255.0, 1.0)
+        if policy.deterministic:
+            # Six decimals, like the other colors, hide differences between decoders
+            diffuse = tuple(round(value, 6) for value in diffuse)
 
-            # Convert the image to base64
-            with open(image, "rb") as image_file:
-                # v1.0 only works with PNG. Use this to maintain compatibility
-                png = imageToPng(image_file.read())
-                encoded_string = b64encode(png)
-                encoded_output = encoded_string.decode('utf-8')
-
-            base = " |-2"
-            while len(encoded_output) > 0:
-                base += "\n      "
-                base += encoded_output[:74]
-                encoded_output = encoded_output[74:]
-            base += "\n"
+        with timed(stats, "png"):
+            img = openImage(imageData, policy)
+        with timed(stats, "hash"):
+            key = textureKey(img, policy)
+            png = storedTexture(key) if store else None
+            stored = storedTiers(key, policy) if png is not None else None
+        if stats is not None:
+            stats["key"] = key
+        if stored is not None:
+            tiers = stored
+            if stats is not None:
+                stats["shared"] = len(png)
+        else:
+            # v1.0 only works with PNG. Use this to maintain compatibility
+            with timed(stats, "png"):
+                png = encodeImage(img, policy, tiers)
+            if store:
+                for size, tier in tiers.items():
+                    storeTexture(f"{key}-{size}", tier)
+                storeTexture(key, png)
+        textureStats(stats, imageData, png, img)
+
+    return png, diffuse, tiers
+
+def cardHash(row : dict, imageData : bytes | None, policy : TexturePolicy = TexturePolicy()) -> str:
+    """Hash of everything that determines the contents of a card"""
+    digest = hashlib.sha256()
+    digest.update(f"generator:{GENERATOR_VERSION}\n".encode("utf-8"))
+    digest.update(json.dumps(asdict(policy), sort_keys=True).encode("utf-8"))
+    digest.update(json.dumps(row, sort_keys=True, default=str).encode("utf-8"))
+    if imageData is not None:
+        digest.update(b"\nimage:")
+        digest.update(imageData)
+    return digest.hexdigest()
+
+def cardPath(row : dict) -> str:
+    return f"{OUTPUT_DIR}/{row['name']}.FCMat"
+
+def previewPath(row : dict, size : int) -> str:
+    return f"{PREVIEW_DIR}/{size}/{row['UUID']}.png"
+
+def writePreviews(row : dict, tiers : dict[int, bytes]) -> None:
+    for size, png in tiers.items():
+        path = previewPath(row, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as outfile:
+            outfile.write(png)
+
+def prunePreviews(rows : list[dict], policy : TexturePolicy = TexturePolicy()) -> int:
+    """Remove the previews of sizes not in the policy and of rows that are gone
+
+    Returns the number of previews removed.
+    """
+    if not os.path.isdir(PREVIEW_DIR):
+        return 0
+    uuids = {row["UUID"] for row in rows if row["name"] is not None}
+    removed = 0
+    for entry in os.scandir(PREVIEW_DIR):
+        if not (entry.is_dir() and entry.name.isdigit()):
+            continue
+        previews = [name for name in os.listdir(entry.path) if name.endswith(".png")]
+        if int(entry.name) not in policy.tiers:
+            shutil.rmtree(entry.path)
+            removed += len(previews)
+            continue
+        for name in previews:
+            if name[:-len(".png")] not in uuids:
+                os.remove(os.path.join(entry.path, name))
+                removed += 1
+    return removed
+
+TEXTURE_PATH = re.compile(r'\s*TexturePath:\s*"(.*)"\s*$')
+
+def cardTexture(filename : str) -> str | None:
+    """The sidecar texture a card references, as a path from the current directory"""
+    try:
+        with open(filename, "r", encoding="utf-8") as infile:
+            for line in infile:
+                if line.lstrip().startswith("TextureImage:"):
+                    break
+                match = TEXTURE_PATH.match(line)
+                if match is not None:
+                    return os.path.normpath(os.path.join(os.path.dirname(filename), match.group(1)))
+    except (OSError, UnicodeDecodeError):
+        pass
+    return None
+
+def outputsExist(row : dict, hasImage : bool, policy : TexturePolicy = TexturePolicy()) -> bool:
+    """Whether the card of a row, its sidecar texture and its previews have been written"""
+    if not os.path.exists(cardPath(row)):
+        return False
+    if not hasImage:
+        return True
+    if policy.sidecar:
+        texture = cardTexture(cardPath(row))
+        if texture is None or not os.path.exists(texture):
+            return False
+    return all(os.path.exists(previewPath(row, size)) for size in policy.tiers)
+
+def loadManifest(section : str = "cards") -> dict:
+    """The input hash of each card by name, or with section="textures" its store key"""
+    try:
+        with open(MANIFEST, "r", encoding="utf-8") as infile:
+            manifest = json.load(infile)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != GENERATOR_VERSION:
+        return {}
+    return manifest.get(section, {})
+
+def saveManifest(cards : dict, textures : dict | None = None) -> None:
+    manifest = {"version": GENERATOR_VERSION, "cards": dict(sorted(cards.items())),
+                "textures": dict(sorted((textures or {}).items()))}
+    with open(MANIFEST, "w", encoding="utf-8") as outfile:
+        json.dump(manifest, outfile, indent=2)
+        outfile.write("\n")
+
+def processRow(parsed : dict, previous : str | None,
+               policy : TexturePolicy = TexturePolicy()) -> tuple[str, bool, str, dict]:
+    """Build a single card unless its inputs are unchanged
+
+    Returns the input hash, whether the card was written, anything printed
+    while doing so, so that messages can be reported in row order, and the
+    time spent in each stage with the sizes of what it produced.
+    """
+    output = StringIO()
+    stats = {}
+    with redirect_stdout(output):
+        with timed(stats, "read"):
+            imageData = readImage(parsed)
+        with timed(stats, "hash"):
+            digest = cardHash(parsed, imageData, policy)
+        built = not (previous == digest and outputsExist(parsed, imageData is not None, policy))
+        if built:
+            png, diffuse, tiers = checkImage(imageData, policy, stats)
+            createCard(parsed, png, diffuse, policy.sidecar, stats)
+            if parsed["name"] is not None:
+                writePreviews(parsed, tiers)
+    return digest, built, output.getvalue(), stats
+
+def updateTextureKeys(textures : dict, report : list[dict]) -> None:
+    """Record the store key of the texture of each card built, forgetting cards built without one"""
+    for card in report:
+        if card["built"]:
+            if "key" in card:
+                textures[card["name"]] = card["key"]
+            else:
+                textures.pop(card["name"], None)
+
+def assignLedger(rows : list[dict], ledger : dict) -> None:
+    """Give rows their ledger UUIDs, saving the ledger if any were added"""
+    if assignUuids(rows, ledger):
+        saveLedger(ledger)
+
+def buildCards(rows : list[dict], manifest : dict, policy : TexturePolicy = TexturePolicy(),
+               jobs : int = 1) -> tuple[dict, list[dict]]:
+    """Build the cards of rows whose inputs differ from the manifest
+
+    Messages are printed in row order. Returns the input hash of each card
+    by name and a report of what was done for each row.
+    """
+    previous = [manifest.get(parsed["name"]) for parsed in rows]
+    results = mapJobs(processRow, rows, previous, repeat(policy), jobs=jobs, chunksize=4)
+
+    built = {}
+    report = []
+    for parsed, (digest, changed, output, stats) in zip(rows, results):
+        print(output, end="")
+        built[parsed["name"]] = digest
+        report.append({"name": parsed["name"], "built": changed, **stats})
+    return built, report
+
+def writeIndexes(rows : list[dict]) -> None:
+    """Write the catalog, elastic matrices and search index where they changed"""
+    if writeCatalog(rows):
+        print(f"Catalog written to '{CATALOG}'")
+    if writeIfChanged(ELASTICITY, createElasticity(rows)):
+        print(f"Elastic matrices written to '{ELASTICITY}'")
+    if writeIfChanged(SEARCH, createSearchIndex(rows)):
+        print(f"Search index written to '{SEARCH}'")
+
+def fileStamp(entry) -> tuple[int, int]:
+    stat = entry.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+def snapshotInputs() -> tuple[tuple[int, int] | None, dict[str, tuple[int, int]]]:
+    """The modification time and size of the workbook and of each image"""
+    try:
+        workbook = fileStamp(Path(FILENAME))
+    except OSError:
+        workbook = None
+    images = {}
+    try:
+        with os.scandir(IMAGES) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    images[entry.name] = fileStamp(entry)
+    except OSError:
+        pass
+    return workbook, images
+
+def rowState(row : dict, images : dict) -> tuple[str, tuple[int, int] | None]:
+    """What a card depends on: its row and the stamp of its image"""
+    return json.dumps(row, sort_keys=True, default=str), images.get(row["image"])
+
+def watch(policy : TexturePolicy = TexturePolicy(), jobs : int = 1, interval : float = WATCH_INTERVAL) -> None:
+    """Rebuild the cards affected by each change to the workbook or images
+
+    Inputs are checked every interval and rebuilt once they have stopped
+    changing, so half written files are left alone. Rows are matched by
+    UUID, and the card of a row that is renamed or removed is deleted.
+    """
+    snapshot = snapshotInputs()
+    rows = readRows(FILENAME)
+    ledger = loadLedger()
+    assignLedger(rows, ledger)
+    manifest, report = buildCards(rows, loadManifest(), policy, jobs)
+    textures = loadManifest("textures")
+    updateTextureKeys(textures, report)
+    textures = {name: key for name, key in textures.items() if name in manifest}
+    saveManifest(manifest, textures)
+    writeIndexes(rows)
+    pruneSidecars()
+    prunePreviews(rows, policy)
+    pruneStore(set(textures.values()))
+    states = {row["UUID"]: rowState(row, snapshot[1]) for row in rows if row["name"] is not None}
+    names = {row["UUID"]: row["name"] for row in rows if row["name"] is not None}
+    print(f"{sum(1 for card in report if card['built'])} cards built, watching for changes")
+
+    seen = snapshot
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshotInputs()
+            if current != seen:
+                # Still changing, wait until it settles
+                seen = current
+                continue
+            if current == snapshot:
+                continue
+            try:
+                if current[0] != snapshot[0]:
+                    rows = readRows(FILENAME)
+                    assignLedger(rows, ledger)
+            except Exception as error:
+                # Most likely saved part way through, try again on the next change
+                print(f"Unable to read '{FILENAME}': {error}")
+                snapshot = current
+                continue
+            snapshot = current
+
+            named = [row for row in rows if row["name"] is not None]
+            changed = [row for row in named if states.get(row["UUID"]) != rowState(row, snapshot[1])]
+            active = {row["name"] for row in named}
+            removed = set(names.values()) - active
+            for name in removed:
+                path = f"{OUTPUT_DIR}/{name}.FCMat"
+                if os.path.exists(path):
+                    os.remove(path)
+                    print(f"Removed '{path}'")
+                manifest.pop(name, None)
+                textures.pop(name, None)
+            for removedUuid in set(names) - {row["UUID"] for row in named}:
+                for size in policy.tiers:
+                    path = previewPath({"UUID": removedUuid}, size)
+                    if os.path.exists(path):
+                        os.remove(path)
+
+            built, report = buildCards(changed, manifest, policy, jobs)
+            manifest.update(built)
+            updateTextureKeys(textures, report)
+            if changed or removed:
+                saveManifest(manifest, textures)
+                writeIndexes(rows)
+                pruneSidecars()
+                pruneStore(set(textures.values()))
+            states = {row["UUID"]: rowState(row, snapshot[1]) for row in named}
+            names = {row["UUID"]: row["name"] for row in named}
+            print(f"{time.strftime('%H:%M:%S')} {sum(1 for card in report if card['built'])} cards built, "
+                  f"{len(removed)} removed")
+    except KeyboardInterrupt:
+        pass
+
+def readOutput(path : str, text : bool) -> str | bytes | None:
+    try:
+        with open(path, "r" if text else "rb", **({"encoding": "utf-8"} if text else {})) as infile:
+            return infile.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+def verifyRow(parsed : dict, policy : TexturePolicy = TexturePolicy()) -> tuple[list[str], str]:
+    """Rebuild the card of a row in memory and compare it with the files written
+
+    Textures are encoded again rather than taken from the store. Returns
+    the paths whose contents differ, and anything printed while rebuilding.
+    """
+    if parsed["name"] is None:
+        return [], ""
+    output = StringIO()
+    with redirect_stdout(output):
+        imageData = readImage(parsed)
+        png, diffuse, tiers = checkImage(imageData, policy, store=False)
+    texture = None
+    texturePath = None
+    expected = {}
+    if png is not None:
+        if policy.sidecar:
+            expected[sidecarPath(png)] = png
+            texturePath = os.path.relpath(sidecarPath(png), OUTPUT_DIR).replace(os.sep, "/")
         else:
-            print(f"Missing image '{image}'")
+            texture = b64encode(png).decode('ascii')
+        for size, tier in tiers.items():
+            expected[previewPath(parsed, size)] = tier
+    card = StringIO()
+    writeCard(card, parsed, texture, diffuse, False, texturePath)
+    expected[cardPath(parsed)] = card.getvalue()
+    differences = [path for path, contents in expected.items()
+                   if readOutput(path, isinstance(contents, str)) != contents]
+    return differences, output.getvalue()
+
+def verifyIndexes(rows : list[dict]) -> list[str]:
+    """The paths of the catalog, elastic matrices and search index that a rebuild would change"""
+    indexes = ((CATALOG, createCatalog), (ELASTICITY, createElasticity), (SEARCH, createSearchIndex))
+    return [path for path, create in indexes if readOutput(path, True) != create(rows)]
+
+def verifyCards(rows : list[dict], policy : TexturePolicy = TexturePolicy(), jobs : int = 1) -> list[str]:
+    """The paths of every card, texture, preview or index that a rebuild would change"""
+    results = mapJobs(verifyRow, rows, repeat(policy), jobs=jobs, chunksize=4)
+    differences = []
+    for paths, output in results:
+        print(output, end="")
+        for path in paths:
+            print(f"Differs: '{path}'")
+        differences += paths
+    for path in verifyIndexes(rows):
+        print(f"Differs: '{path}'")
+        differences.append(path)
+    return differences
+
+def printSizeReport(report : list[tuple[str, dict]]) -> None:
+    print(f"{'Card':<32}{'Size':>10}{'Source':>12}{'PNG':>12}{'Texture':>12}")
+    totals = {"source": 0, "png": 0, "texture": 0}
+    for name, stats in report:
+        size = f"{stats['width']}x{stats['height']}"
+        print(f"{name:<32}{size:>10}{stats['source']:>12,}{stats['png']:>12,}{stats['texture']:>12,}")
+        for key in totals:
+            totals[key] += stats[key]
+    print(f"{'Total':<32}{'':>10}{totals['source']:>12,}{totals['png']:>12,}{totals['texture']:>12,}")
+
+PROFILE_STAGES = ["read", "hash", "mean", "png", "encode", "write"]
+PROFILE_SIZES = ["source", "png", "texture", "card", "width", "height", "shared"]
+# Stages timed once for the whole run, only reported in the totals
+PROFILE_RUN_STAGES = ["load", "catalog", "wall"]
+
+def writeProfile(filename : str, report : list[dict], totals : dict) -> None:
+    """Write the per card timings and sizes as CSV or JSON, by extension"""
+    if filename.lower().endswith(".csv"):
+        stages = PROFILE_STAGES + PROFILE_RUN_STAGES
+        with open(filename, "w", encoding="utf-8", newline="") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(["name", "built"] + [f"{stage}_s" for stage in stages] + PROFILE_SIZES)
+            for card in report + [totals]:
+                writer.writerow([card["name"], card.get("built", "")]
+                                + [f"{card['seconds'].get(stage, 0.0):.6f}" for stage in stages]
+                                + [card.get(size, "") for size in PROFILE_SIZES])
+    else:
+        with open(filename, "w", encoding="utf-8") as outfile:
+            json.dump({"cards": report, "totals": totals}, outfile, indent=2)
+            outfile.write("\n")
+
+def profileTotals(report : list[dict], seconds : dict) -> dict:
+    totals = {"name": "Total", "seconds": dict(seconds)}
+    for card in report:
+        for stage, elapsed in card["seconds"].items():
+            totals["seconds"][stage] = totals["seconds"].get(stage, 0.0) + elapsed
+        for size in PROFILE_SIZES[:4]:
+            totals[size] = totals.get(size, 0) + card.get(size, 0)
+    return totals
+
+def printAudit(rows : list[dict], tolerance : float) -> None:
+    """List the rows whose elastic constants fail the consistency checks"""
+    checks = properties.checkProperties(properties.createTable(rows))
+    flags = properties.flagRows(checks, tolerance)
+    tested = sum(1 for index in range(len(rows)) if any(not numpy.isnan(check[index]) for check in checks.values()))
+    flagged = 0
+    for index, (row, failed) in enumerate(zip(rows, flags)):
+        if failed:
+            flagged += 1
+            details = ", ".join(f"{name} {checks[name][index]:.0%}" for name in failed)
+            print(f"{row['name']}: {details}")
+    print(f"{flagged} of {tested} materials with elastic constants fail the checks")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create material files from the properties spreadsheet")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every card, ignoring the build manifest, row cache and texture store")
+    parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                        help="number of worker processes, 0 for one per CPU (default 1)")
+    parser.add_argument("--sync-uuids", action="store_true",
+                        help=f"write UUIDs assigned in {LEDGER} back into the workbook")
+    parser.add_argument("--watch", nargs="?", type=float, const=WATCH_INTERVAL, metavar="SECONDS",
+                        help=f"keep running and rebuild the cards of the rows and images that change, "
+                             f"checking every SECONDS (default {WATCH_INTERVAL})")
+    texture = parser.add_argument_group("texture policy")
+    texture.add_argument("--max-edge", type=int, metavar="PIXELS",
+                         help="downscale textures so the longest edge is at most PIXELS")
+    texture.add_argument("--colors", type=int, choices=range(2, 257), metavar="N",
+                         help="quantize textures to an adaptive palette of N (2-256) colors")
+    texture.add_argument("--compress-level", type=int, choices=range(0, 10), metavar="LEVEL",
+                         help="zlib compression level 0-9, 9 also optimizes the PNG")
+    texture.add_argument("--strip-metadata", action="store_true",
+                         help="drop ICC profiles and other metadata chunks")
+    texture.add_argument("--textures", choices=["inline", "sidecar"], default="inline",
+                         help="embed textures in the cards, or write them to a shared directory "
+                              "referenced by TexturePath (default inline)")
+    texture.add_argument("--tiers", type=int, nargs="*", default=list(PREVIEW_TIERS), metavar="PIXELS",
+                         help=f"longest edges of the preview textures written to {PREVIEW_DIR}, "
+                              f"none to skip them (default {' '.join(map(str, PREVIEW_TIERS))})")
+    texture.add_argument("--deterministic", action="store_true",
+                         help="write the same bytes for the same inputs whatever the PIL version: PNGs of "
+                              "only the pixels with pinned compression, and colors rounded to 6 decimals")
+    texture.add_argument("--size-report", action="store_true",
+                         help="print the texture sizes of every card built")
+    parser.add_argument("--verify", action="store_true",
+                        help="rebuild every card in memory and report those that differ from the files "
+                             "written, exiting with status 1 if any do")
+    parser.add_argument("--validate", action="store_true",
+                        help="check every card against the model schemas after building, "
+                             "exiting with status 1 if any fail")
+    parser.add_argument("--pack", action="store_true",
+                        help=f"write the cards and sidecar textures to the compressed pack {PACK}")
+    parser.add_argument("--audit", nargs="?", type=float, const=properties.TOLERANCE, metavar="TOLERANCE",
+                        help="check the Poisson ratios against the moduli of every material and list those "
+                             f"off by more than TOLERANCE (default {properties.TOLERANCE})")
+    profile = parser.add_argument_group("profiling")
+    profile.add_argument("--profile", metavar="FILE",
+                         help="write the time and bytes of each stage for every card to FILE, "
+                              "as CSV if it ends in .csv and JSON otherwise")
+    profile.add_argument("--cprofile", metavar="FILE",
+                         help="write cProfile statistics for the whole run to FILE, "
+                              "worker processes are not included")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.cprofile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    started = time.perf_counter()
+
+    policy = TexturePolicy(maxEdge=args.max_edge, colors=args.colors,
+                           compressLevel=args.compress_level, stripMetadata=args.strip_metadata,
+                           sidecar=args.textures == "sidecar", tiers=tuple(sorted(set(args.tiers))),
+                           deterministic=args.deterministic)
+
+    # Create the output folder if required
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    manifest = {} if args.force else loadManifest()
+    textures = {} if args.force else loadManifest("textures")
+    if args.force:
+        # Textures encoded by an older PIL or encoder are rebuilt too
+        shutil.rmtree(TEXTURE_STORE, ignore_errors=True)
+
+    seconds = {}
+    with timed({"seconds": seconds}, "load"):
+        rows = readRows(FILENAME, cache=None if args.force else ROW_CACHE)
+    ledger = loadLedger()
+    assignLedger(rows, ledger)
+    if args.sync_uuids:
+        print(f"{syncUuids(FILENAME, ledger)} UUIDs written to '{FILENAME}'")
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.verify:
+        differences = verifyCards(rows, policy, jobs)
+        print(f"{len(differences)} files differ from a rebuild")
+        sys.exit(1 if differences else 0)
+    if args.watch is not None:
+        watch(policy, jobs, args.watch)
+        return
 
-    return base, diffuse
+    built, report = buildCards(rows, manifest, policy, jobs)
+    count = sum(1 for card in report if card["built"])
+    updateTextureKeys(textures, report)
+    textures = {name: key for name, key in textures.items() if name in built}
+    pruned = pruneStore(set(textures.values()))
+    if pruned:
+        print(f"{pruned} textures no card uses removed from '{TEXTURE_STORE}'")
+    pruned = pruneSidecars()
+    if pruned:
+        print(f"{pruned} textures no card uses removed from '{TEXTURE_DIR}'")
+    pruned = prunePreviews(rows, policy)
+    if pruned:
+        print(f"{pruned} previews no longer written removed from '{PREVIEW_DIR}'")
 
-# Create the output folder if required
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+    saveManifest(built, textures)
+    with timed({"seconds": seconds}, "catalog"):
+        writeIndexes(rows)
+    if args.pack and writePack():
+        print(f"Pack written to '{PACK}'")
+    if args.audit is not None:
+        printAudit(rows, args.audit)
+    if args.size_report:
+        printSizeReport([(card["name"], card) for card in report if card["built"] and "source" in card])
+    shared = [card["shared"] for card in report if "shared" in card]
+    if shared:
+        print(f"{len(shared)} textures reused from '{TEXTURE_STORE}', {sum(shared):,} bytes not encoded again")
+    print(f"{count} cards built, {len(built) - count} unchanged")
+    invalid = {}
+    if args.validate:
+        invalid, _ = validate.validate(sorted(glob.glob(f"{OUTPUT_DIR}/*.FCMat")), validate.loadSchemas(), jobs)
+        for filename, problems in invalid.items():
+            for problem in problems:
+                print(f"{filename}: {problem}")
+        print(f"{sum(len(problems) for problems in invalid.values())} schema problems in {len(invalid)} cards")
 
-# wb = load_workbook(filename=FILENAME, read_only=True)
-wb = load_workbook(filename=FILENAME, read_only=False)
-ws = wb['All']
-# for row in ws.iter_rows(min_row=5, max_row=247, max_col=22, values_only=True):
-for row in ws.iter_rows(min_row=ROW_MIN, max_row=ROW_MAX, max_col=COLUMN_MAX):
-    cell = row[20]
-    parsed = parseRow(row)
-    base, diffuse = checkImage(parsed)
-    createCard(parsed, base, diffuse)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+    if args.profile:
+        seconds["wall"] = time.perf_counter() - started
+        writeProfile(args.profile, report, profileTotals(report, seconds))
+    if invalid:
+        sys.exit(1)
 
-wb.save(filename=FILENAME)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileCopyrightText: 2025 David Carter <dcarter@davidcarter.ca>
+# SPDX-FileNotice: Part of the Woods addons.
+
+################################################################################
+#                                                                              #
+#   Copyright (c) 2025 David Carter <dcarter@davidcarter.ca>                   #
+#                                                                              #
+#   This addon is free software; you can redistribute it and/or modify it      #
+#   under the terms of the GNU Lesser General Public License as published      #
+#   by the Free Software Foundation; either version 2.1 of the License, or     #
+#   (at your option) any later version.                                        #
+#                                                                              #
+#   This addon is distributed in the hope that it will be useful,              #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of             #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       #
+#                                                                              #
+#   See the GNU Lesser General Public License for more details.                #
+#                                                                              #
+#   You should have received a copy of the GNU Lesser General Public License   #
+#   along with this addon; if not, write to the Free Software Foundation,      #
+#   Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA           #
+#                                                                              #
+################################################################################
+
+"""Check the material cards against the model schemas
+
+Each card is read up to its TextureImage, and the properties of every model
+defined in MODEL_DIR are checked for their name, type and units. Models that
+only FreeCAD defines are counted but not checked.
+"""
+
+__title__ = "FreeCAD Materials Validation"
+__author__ = "David Carter"
+__url__ = "https://www.davesrocketshop.com"
+
+from itertools import repeat
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+import yaml
+
+from pool import mapJobs
+
+MATERIAL_DIR = "freecad/Woods/Resources/Materials"
+MODEL_DIR = "freecad/Woods/Resources/Models"
+
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Models that FreeCAD defines and models in MODEL_DIR inherit, with the
+# properties the cards use
+FREECAD_MODELS = {
+    "454661e5-265b-4320-8e6f-fcf6223ac3af": {
+        "Name": "Density",
+        "Inherits": [],
+        "Properties": {
+            "Density": ("Quantity", "kg/m^3"),
+        },
+    },
+    "7b561d1d-fb9b-44f6-9da9-56a4f74d7536": {
+        "Name": "Linear Elastic",
+        "Inherits": ["454661e5-265b-4320-8e6f-fcf6223ac3af"],
+        "Properties": {
+            "AngleOfFriction": ("Quantity", "deg"),
+            "CompressiveStrength": ("Quantity", "kPa"),
+            "FractureToughness": ("Quantity", "MPa*m^0.5"),
+            "PoissonRatio": ("Float", ""),
+            "ShearModulus": ("Quantity", "kPa"),
+            "UltimateStrain": ("Float", ""),
+            "UltimateTensileStrength": ("Quantity", "kPa"),
+            "YieldStrength": ("Quantity", "kPa"),
+            "YoungsModulus": ("Quantity", "kPa"),
+        },
+    },
+}
+
+# Dimensions of each unit as powers of mass, length, time and temperature
+UNITS = {
+    "": (0, 0, 0, 0),
+    "deg": (0, 0, 0, 0),
+    "rad": (0, 0, 0, 0),
+    "g": (1, 0, 0, 0),
+    "kg": (1, 0, 0, 0),
+    "um": (0, 1, 0, 0),
+    "mm": (0, 1, 0, 0),
+    "cm": (0, 1, 0, 0),
+    "m": (0, 1, 0, 0),
+    "km": (0, 1, 0, 0),
+    "s": (0, 0, 1, 0),
+    "min": (0, 0, 1, 0),
+    "h": (0, 0, 1, 0),
+    "K": (0, 0, 0, 1),
+    "N": (1, 1, -2, 0),
+    "kN": (1, 1, -2, 0),
+    "Pa": (1, -1, -2, 0),
+    "kPa": (1, -1, -2, 0),
+    "MPa": (1, -1, -2, 0),
+    "GPa": (1, -1, -2, 0),
+    "J": (1, 2, -2, 0),
+    "kJ": (1, 2, -2, 0),
+    "W": (1, 2, -3, 0),
+    "kW": (1, 2, -3, 0),
+}
+
+QUANTITY = re.compile(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*(.*?)\s*$")
+
+def dimension(unit : str) -> tuple[float, ...]:
+    """The dimension of a unit like "m^4/kg/s", where each / divides one factor
+
+    Raises KeyError for a unit not in UNITS.
+    """
+    total = [0.0] * 4
+    sign = 1
+    for token in re.split(r"([*/])", unit.replace(" ", "")):
+        if token in ("*", "/"):
+            sign = 1 if token == "*" else -1
+            continue
+        symbol, _, power = token.partition("^")
+        for index, value in enumerate(UNITS[symbol]):
+            total[index] += sign * value * float(power or 1)
+    return tuple(total)
+
+def readModel(filename : str) -> tuple[str, dict]:
+    with open(filename, "r", encoding="utf-8") as infile:
+        model = yaml.load(infile, Loader=Loader)["Model"]
+    inherits = []
+    for parent in model.get("Inherits") or []:
+        if isinstance(parent, dict) and "UUID" in parent:
+            inherits.append(parent["UUID"])
+    properties = {name : (value["Type"], value.get("Units") or "")
+                  for name, value in model.items() if isinstance(value, dict) and "Type" in value}
+    return model["UUID"], {"Name": model["Name"], "Inherits": inherits, "Properties": properties}
+
+def loadSchemas(directory : str = MODEL_DIR) -> dict[str, dict]:
+    """The models in directory by UUID, each with the properties it inherits"""
+    models = dict(FREECAD_MODELS)
+    for filename in sorted(glob.glob(os.path.join(directory, "*.yml"))):
+        uuid, model = readModel(filename)
+        models[uuid] = model
+
+    def inherited(uuid : str, seen : frozenset) -> dict:
+        model = models.get(uuid)
+        if model is None or uuid in seen:
+            return {}
+        properties = {}
+        for parent in model["Inherits"]:
+            properties.update(inherited(parent, seen | {uuid}))
+        properties.update(model["Properties"])
+        return properties
+
+    local = {uuid : model for uuid, model in models.items() if uuid not in FREECAD_MODELS}
+    return {uuid : {"Name": model["Name"], "Properties": inherited(uuid, frozenset())}
+            for uuid, model in local.items()}
+
+def readHeader(filename : str) -> dict:
+    """The YAML of a card up to its TextureImage"""
+    header = []
+    with open(filename, "rb") as infile:
+        for line in infile:
+            if line.lstrip(b" ").startswith(b"TextureImage:"):
+                break
+            header.append(line)
+    return yaml.load(b"".join(header).decode("utf-8"), Loader=Loader) or {}
+
+def checkValue(kind : str, units : str, value) -> str | None:
+    """Why value isn't a valid kind with the dimension of units, or None"""
+    if kind == "Quantity":
+        match = QUANTITY.fullmatch(str(value))
+        if match is None:
+            return f"'{value}' is not a quantity"
+        unit = match.group(2)
+        if not unit and units:
+            return f"'{value}' has no units, expected {units}"
+        try:
+            if dimension(unit) != dimension(units):
+                return f"'{value}' has units incompatible with {units}"
+        except KeyError:
+            return f"'{value}' has unknown units"
+    elif kind == "Float":
+        try:
+            float(value)
+        except (TypeError, ValueError):
+            return f"'{value}' is not a number"
+    elif kind == "Integer":
+        try:
+            int(str(value))
+        except ValueError:
+            return f"'{value}' is not an integer"
+    elif kind == "Boolean":
+        if str(value) not in ("True", "False"):
+            return f"'{value}' is not True or False"
+    elif kind == "List":
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            return "is not a list of strings"
+    elif kind in ("String", "URL"):
+        if not isinstance(value, str):
+            return f"'{value}' is not a string"
+    return None
+
+def validateCard(filename : str, schemas : dict[str, dict]) -> tuple[list[str], int]:
+    """The problems found in a card, and the number of models it has that weren't checked"""
+    try:
+        card = readHeader(filename)
+    except (OSError, UnicodeDecodeError, yaml.YAMLError) as error:
+        return [f"unreadable: {error}"], 0
+    problems = []
+    general = card.get("General") or {}
+    for key in ("UUID", "Name"):
+        if not general.get(key):
+            problems.append(f"General has no {key}")
+    unchecked = 0
+    for name, values in (card.get("Models") or {}).items():
+        if not isinstance(values, dict) or "UUID" not in values:
+            problems.append(f"model '{name}' has no UUID")
+            continue
+        schema = schemas.get(values["UUID"])
+        if schema is None:
+            unchecked += 1
+            continue
+        if schema["Name"] != name:
+            problems.append(f"model '{name}' has the UUID of '{schema['Name']}'")
+        for key, value in values.items():
+            if key == "UUID":
+                continue
+            if key not in schema["Properties"]:
+                problems.append(f"{name}: unknown property '{key}'")
+                continue
+            reason = checkValue(*schema["Properties"][key], value)
+            if reason is not None:
+                problems.append(f"{name}: {key} {reason}")
+    return problems, unchecked
+
+def validate(filenames : list[str], schemas : dict[str, dict], jobs : int = 1) -> tuple[dict[str, list[str]], int]:
+    """The problems of each card with any, and the total number of models not checked"""
+    results = mapJobs(validateCard, filenames, repeat(schemas), jobs=jobs, chunksize=16)
+    report = {}
+    unchecked = 0
+    for filename, (problems, count) in zip(filenames, results):
+        if problems:
+            report[filename] = problems
+        unchecked += count
+    return report, unchecked
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the material cards against the model schemas")
+    parser.add_argument("cards", nargs="*",
+                        help=f"cards to check (default every card in {MATERIAL_DIR})")
+    parser.add_argument("--models", default=MODEL_DIR, metavar="DIR",
+                        help=f"directory of the model schemas (default {MODEL_DIR})")
+    parser.add_argument("--jobs", "-j", type=int, default=0, metavar="N",
+                        help="number of worker processes, 0 for one per CPU (default 0)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    schemas = loadSchemas(args.models)
+    filenames = args.cards or sorted(glob.glob(os.path.join(MATERIAL_DIR, "*.FCMat")))
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    report, unchecked = validate(filenames, schemas, jobs)
+
+    for filename, problems in report.items():
+        for problem in problems:
+            print(f"{filename}: {problem}")
+    count = sum(len(problems) for problems in report.values())
+    print(f"{len(filenames)} cards checked against {len(schemas)} models in "
+          f"{time.perf_counter() - started:.2f}s, {count} problems in {len(report)} cards, "
+          f"{unchecked} models defined by FreeCAD not checked")
+    sys.exit(1 if report else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileNotice: Part of the Woods addons.
+
+"""Lazy reader for material cards
+
+Only the part of a card before `TextureImage:` is parsed, so reading
+the whole library touches a few kilobytes per card. The position of the
+texture is remembered and it is decoded only when asked for, and small
+previews are read from their own files.
+
+    from freecad.Woods import Cards
+
+    for card in Cards.cards():
+        print(card.name,card.models[ 'Wood' ][ 'Density' ])
+"""
+
+import os
+import yaml
+from base64 import b64decode
+from functools import lru_cache
+
+from .Pack import directory as materials
+from .Pack import previews
+
+
+CacheSize = 512
+
+Loader = getattr(yaml,'CSafeLoader',yaml.SafeLoader)
+
+
+class Card:
+
+    """The metadata of a card and the location of its texture"""
+
+    __slots__ = ( 'path' , 'data' , 'textureOffset' )
+
+    def __init__ ( self , path : str , data : dict , textureOffset : int | None ):
+
+        self.path = path
+        self.data = data
+        self.textureOffset = textureOffset
+
+    @property
+    def general ( self ) -> dict:
+        return self.data.get('General',{})
+
+    @property
+    def models ( self ) -> dict:
+        return self.data.get('Models',{})
+
+    @property
+    def appearance ( self ) -> dict:
+        return self.data.get('AppearanceModels',{})
+
+    @property
+    def name ( self ) -> str:
+        return self.general.get('Name')
+
+    @property
+    def uuid ( self ) -> str:
+        return self.general.get('UUID')
+
+    def texture ( self ) -> bytes | None:
+
+        """The decoded texture image, inline or from `TexturePath`"""
+
+        if self.textureOffset is not None:
+            return _readTexture(self.path,self.textureOffset)
+
+        for model in self.appearance.values():
+            if isinstance(model,dict) and model.get('TexturePath'):
+                path = os.path.join(os.path.dirname(self.path),model[ 'TexturePath' ])
+                with open(path,'rb') as file:
+                    return file.read()
+
+        return None
+
+    def preview ( self , size : int ) -> bytes | None:
+
+        """
+        The smallest preview at least `size` pixels across, falling back
+        to the full texture when there is none.
+        """
+
+        for tier in _tiers():
+            if tier >= size:
+                path = os.path.join(previews(),str(tier),f'{ self.uuid }.png')
+                if os.path.exists(path):
+                    with open(path,'rb') as file:
+                        return file.read()
+
+        return self.texture()
+
+
+@lru_cache( maxsize = 1 )
+def _tiers () -> list[ int ]:
+
+    # The preview sizes written by the generator, smallest first
+
+    try:
+        with os.scandir(previews()) as entries:
+            return sorted( int(entry.name) for entry in entries if entry.is_dir() and entry.name.isdigit() )
+    except OSError:
+        return []
+
+
+def _readTexture ( path : str , offset : int ) -> bytes:
+
+    # The block scalar ends at the first line indented less than its first
+
+    lines = []
+    indent = None
+
+    with open(path,'rb') as file:
+        file.seek(offset)
+        for line in file:
+            stripped = line.lstrip(b' ')
+            if not stripped.strip():
+                continue
+            depth = len(line) - len(stripped)
+            if indent is None:
+                indent = depth
+            elif depth < indent:
+                break
+            lines.append(stripped.strip())
+
+    return b64decode(b''.join(lines))
+
+
+@lru_cache( maxsize = CacheSize )
+def _read ( path : str , mtime : int ) -> Card:
+
+    header = []
+    offset = None
+
+    with open(path,'rb') as file:
+        for line in file:
+            if line.lstrip(b' ').startswith(b'TextureImage:'):
+                offset = file.tell()
+                break
+            header.append(line)
+
+    data = yaml.load(b''.join(header).decode('utf-8'),Loader = Loader) or {}
+
+    return Card(path,data,offset)
+
+
+def read ( path ) -> Card:
+
+    """
+    The card at `path`, from the cache if the file hasn't changed.
+
+    The returned card is shared by later calls and must not be modified.
+    """
+
+    path = os.fspath(path)
+
+    return _read(path,os.stat(path).st_mtime_ns)
+
+
+def cards ( directory = None ):
+
+    """Every card in `directory`, the addon materials by default"""
+
+    if directory is None:
+        directory = materials()
+
+    paths = sorted(
+        entry.path for entry in os.scandir(os.fspath(directory))
+        if entry.name.endswith('.FCMat')
+    )
+
+    for path in paths:
+        yield read(path)
+
+
+def clearCache ():
+
+    _read.cache_clear()
+    _tiers.cache_clear()
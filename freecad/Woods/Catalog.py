@@ -0,0 +1,112 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileNotice: Part of the Woods addons.
+
+"""Property queries over the prebuilt catalog of all woods
+
+The catalog is written by Utilities/spreadsheet.py and holds every value
+the material cards contain, apart from the appearance, so searches don't
+need to parse the cards. Values are in the units given by `units()`.
+
+    from freecad.Woods import Catalog
+
+    Catalog.query( Softwood = True , Density = ( None , 500 ) , Hardness = ( 3000 , None ) )
+"""
+
+import json
+from bisect import bisect_left , bisect_right
+from functools import lru_cache
+
+from .Resources import catalog
+
+
+@lru_cache( maxsize = 1 )
+def _load ():
+
+    with open(catalog,encoding = 'utf-8') as file:
+        data = json.load(file)
+
+    return data[ 'materials' ] , data[ 'units' ]
+
+
+@lru_cache( maxsize = None )
+def _index ( name : str ):
+
+    # Sorted values of a numeric property with the matching positions
+
+    entries = sorted(
+        ( value , position )
+        for position , material in enumerate(materials())
+        if isinstance(value := material.get(name),( int , float )) and not isinstance(value,bool)
+    )
+
+    return [ value for value , _ in entries ] , [ position for _ , position in entries ]
+
+
+def materials () -> list[ dict ]:
+
+    return _load()[ 0 ]
+
+
+def units () -> dict[ str , str ]:
+
+    return _load()[ 1 ]
+
+
+def byUuid ( uuid : str ) -> dict | None:
+
+    for material in materials():
+        if uuid in ( material[ 'UUID' ] , material[ 'UUID2' ] ):
+            return material
+
+    return None
+
+
+def _inRange ( name : str , minimum , maximum ) -> set[ int ]:
+
+    values , positions = _index(name)
+
+    start = 0 if minimum is None else bisect_left(values,minimum)
+    stop = len(values) if maximum is None else bisect_right(values,maximum)
+
+    return set(positions[ start : stop ])
+
+
+def _matches ( value , expected ) -> bool:
+
+    if isinstance(value,list):
+        return expected in value
+
+    return value == expected
+
+
+def query ( ** criteria ) -> list[ dict ]:
+
+    """
+    Materials that match every criterion, in catalog order.
+
+    A tuple `( minimum , maximum )` selects a numeric property within
+    the inclusive range, where either bound may be `None`. Materials
+    without a value for the property are excluded. Any other value must
+    be equal to the property, or contained in it for lists like `Range`.
+    """
+
+    found = None
+
+    for name , expected in criteria.items():
+        if isinstance(expected,tuple):
+            positions = _inRange(name,*expected)
+            found = positions if found is None else found & positions
+
+    candidates = materials()
+
+    if found is not None:
+        candidates = [ candidates[ position ] for position in sorted(found) ]
+
+    return [
+        material for material in candidates
+        if all(
+            _matches(material.get(name),expected)
+            for name , expected in criteria.items()
+            if not isinstance(expected,tuple)
+        )
+    ]
@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileNotice: Part of the Woods addons.
+
+"""Precomputed orthotropic elastic matrices keyed by material UUID
+
+The generator builds the 6x6 compliance and stiffness matrices of every
+wood with a full set of elastic constants, so FEM preprocessing doesn't
+have to parse the card values and invert a matrix per material.
+
+Rows and columns follow `order()`, the normal directions L, R, T then the
+shear planes RT, LT, LR. Compliance is in 1/MPa and stiffness in MPa.
+
+    from freecad.Woods import Elasticity
+
+    C = Elasticity.stiffness( material.UUID )
+"""
+
+import json
+import numpy
+from functools import lru_cache
+
+from .Resources import elasticity
+
+
+@lru_cache( maxsize = 1 )
+def _load ():
+
+    with open(elasticity,encoding = 'utf-8') as file:
+        return json.load(file)
+
+
+@lru_cache( maxsize = None )
+def _matrix ( uuid : str , kind : str ):
+
+    material = _load()[ 'materials' ].get(uuid)
+
+    if material is None or material[ kind ] is None:
+        return None
+
+    matrix = numpy.array(material[ kind ],dtype = numpy.float64).reshape(6,6)
+
+    # Shared between callers, so it must not be changed
+    matrix.flags.writeable = False
+
+    return matrix
+
+
+def order () -> list[ str ]:
+
+    return _load()[ 'order' ]
+
+
+def units () -> dict[ str , str ]:
+
+    return _load()[ 'units' ]
+
+
+def materials () -> list[ str ]:
+
+    """UUIDs of the materials that have matrices"""
+
+    return list(_load()[ 'materials' ])
+
+
+def isPositiveDefinite ( uuid : str ) -> bool:
+
+    material = _load()[ 'materials' ].get(uuid)
+
+    return material is not None and material[ 'PositiveDefinite' ]
+
+
+def compliance ( uuid : str ) -> numpy.ndarray | None:
+
+    """The read only compliance matrix, or None without a full set of constants"""
+
+    return _matrix(uuid,'Compliance')
+
+
+def stiffness ( uuid : str ) -> numpy.ndarray | None:
+
+    """
+    The read only stiffness matrix, or None without a full set of
+    constants or if the compliance isn't positive definite.
+    """
+
+    return _matrix(uuid,'Stiffness')
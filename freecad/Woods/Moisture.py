@@ -0,0 +1,130 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileNotice: Part of the Woods addons.
+
+"""Moisture content adjustment of the catalog properties
+
+The cards give properties at 12 % moisture content. Strength and
+stiffness are adjusted with the Wood Handbook rule of a fixed percentage
+change for each 1 % change in moisture content, applied exponentially
+and held at the green value above `StrengthSaturation`. Shrinkage from
+green is taken as proportional to the moisture lost below
+`FiberSaturation`.
+
+Every species is adjusted at once, one column per property, and the
+result for each moisture content is kept.
+
+    from freecad.Woods import Moisture
+
+    values = Moisture.adjusted([ 8 , 12 , 15 ])
+    values[ 'ModulusOfRuptureLong' ]    # species x moisture contents
+"""
+
+import numpy
+from functools import lru_cache
+
+from . import Catalog
+
+
+ReferenceMoisture = 12.0
+
+StrengthSaturation = 25.0
+
+FiberSaturation = 30.0
+
+# Percent change for each 1 % change in moisture content at about 12 %,
+# from the Wood Handbook table of moisture effects on clear wood
+
+Sensitivity = {
+    'YoungsModulus' : 2.0 ,
+    'YoungsModulusLong' : 2.0 ,
+    'YoungsModulusRadLong' : 20.0 ,
+    'YoungsModulusTanLong' : 20.0 ,
+    'ShearModulusLongRad' : 20.0 ,
+    'ShearModulusLongTan' : 20.0 ,
+    'ShearModulusRadTan' : 20.0 ,
+    'ModulusOfRuptureLong' : 4.0 ,
+    'UltimateTensileStrength' : 2.5 ,
+    'UltimateStrengthLong' : 2.5 ,
+    'UltimateStrengthCross' : 2.0 ,
+    'CompressiveStrength' : 6.0 ,
+    'CompressiveStrengthLong' : 6.0 ,
+    'CompressiveStrengthCross' : 5.5 ,
+    'ShearStrengthLong' : 3.0 ,
+    'WorkToMaximumLoad' : 0.5 ,
+}
+
+Shrinkage = [
+    'ShrinkRadial' ,
+    'ShrinkTangential' ,
+    'ShrinkVolume' ,
+    'ShrinkLong' ,
+]
+
+
+def _column ( name : str ) -> numpy.ndarray:
+
+    values = [ material.get(name) for material in Catalog.materials() ]
+
+    return numpy.array([ numpy.nan if value is None else value for value in values ],dtype = numpy.float64)
+
+
+@lru_cache( maxsize = 1 )
+def _table () -> dict[ str , numpy.ndarray ]:
+
+    return { name : _column(name) for name in [ * Sensitivity , * Shrinkage ] }
+
+
+@lru_cache( maxsize = 64 )
+def _atMoisture ( moisture : float ) -> dict[ str , numpy.ndarray ]:
+
+    table = _table()
+    strength = min(moisture,StrengthSaturation) - ReferenceMoisture
+    remaining = max(FiberSaturation - moisture,0.0) / FiberSaturation
+
+    result = {}
+
+    for name , percent in Sensitivity.items():
+        result[ name ] = table[ name ] * ( 1 - percent / 100 ) ** strength
+
+    for name in Shrinkage:
+        result[ name ] = table[ name ] * remaining
+
+    for values in result.values():
+        values.flags.writeable = False
+
+    return result
+
+
+def uuids () -> list[ str ]:
+
+    """Material UUIDs in the order of the rows of every result"""
+
+    return [ material[ 'UUID' ] for material in Catalog.materials() ]
+
+
+def adjusted ( moisture ) -> dict[ str , numpy.ndarray ]:
+
+    """
+    Properties of every species at `moisture` percent.
+
+    For a single moisture content each property is an array with one
+    value per species. For a sequence, it has one column per moisture
+    content. Units are those of `Catalog.units()`, shrinkage is the
+    percentage from green, and missing values are NaN.
+    """
+
+    if numpy.ndim(moisture) == 0:
+        return dict(_atMoisture(float(moisture)))
+
+    results = [ _atMoisture(float(value)) for value in moisture ]
+
+    return {
+        name : numpy.stack([ result[ name ] for result in results ],axis = 1)
+        for name in [ * Sensitivity , * Shrinkage ]
+    }
+
+
+def clearCache ():
+
+    _table.cache_clear()
+    _atMoisture.cache_clear()
@@ -0,0 +1,120 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileNotice: Part of the Woods addons.
+
+"""Extraction of the compressed material pack
+
+When the addon is installed with `Resources/Materials.zip` instead of the
+raw cards, the pack is extracted into the user cache on first use, in a
+folder named by the hash of its contents. It is only extracted again when
+a different pack is installed. Whenever the raw cards are present they
+are used, so a pack left in a checkout never hides regenerated cards.
+
+Each install extracts to its own folder of the cache, so installs of
+different versions never remove each other's cards.
+
+    from freecad.Woods import Pack
+
+    Pack.directory()    # The folder holding the cards
+    Pack.previews()     # The folder holding the previews
+"""
+
+import hashlib
+import os
+import shutil
+import zipfile
+from functools import lru_cache
+
+from .Resources import materials , pack
+from .Resources import previews as previewFolder
+
+
+def _cacheRoot () -> str:
+
+    try:
+        import FreeCAD
+        root = FreeCAD.getUserCachePath()
+    except ( ImportError , AttributeError ):
+        root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'),'.cache')
+
+    install = hashlib.sha256(os.path.abspath(pack).encode('utf-8')).hexdigest()[ : 16 ]
+
+    return os.path.join(root,'Woods',install)
+
+
+def _extract ( archive : zipfile.ZipFile , target : str ):
+
+    # Extract beside the target and rename, so an interrupted extraction
+    # is never mistaken for a complete one
+
+    temporary = f'{ target }.{ os.getpid() }'
+
+    shutil.rmtree(temporary,ignore_errors = True)
+    archive.extractall(temporary)
+
+    try:
+        os.replace(temporary,target)
+    except OSError:
+        # Another process finished first
+        shutil.rmtree(temporary,ignore_errors = True)
+
+
+def _prune ( root : str , keep : str ):
+
+    # Remove the folders of the packs this install no longer has
+
+    for entry in os.scandir(root):
+        if entry.is_dir() and entry.path != keep and '.' not in entry.name:
+            shutil.rmtree(entry.path,ignore_errors = True)
+
+
+@lru_cache( maxsize = 1 )
+def _extracted () -> str | None:
+
+    # The folder the installed pack is extracted to, or None when the raw
+    # cards are installed or there is no pack
+
+    if os.path.isdir(materials) or not os.path.isfile(pack):
+        return None
+
+    try:
+        with zipfile.ZipFile(pack) as archive:
+            digest = archive.comment.decode('ascii')
+            if not digest:
+                return None
+
+            root = _cacheRoot()
+            target = os.path.join(root,digest)
+
+            if not os.path.isdir(target):
+                os.makedirs(root,exist_ok = True)
+                _extract(archive,target)
+                _prune(root,target)
+
+    except ( OSError , zipfile.BadZipFile , UnicodeDecodeError ):
+        return None
+
+    return target
+
+
+def directory () -> str:
+
+    """The folder holding the material cards"""
+
+    target = _extracted()
+
+    if target is None:
+        return materials
+
+    return os.path.join(target,'Materials')
+
+
+def previews () -> str:
+
+    """The folder holding the previews, one subfolder per size"""
+
+    target = _extracted()
+
+    if target is None:
+        return previewFolder
+
+    return os.path.join(target,'Previews')
@@ -1,20 +1,39 @@
 # SPDX-License-Identifier: LGPL-2.1-or-later
 # SPDX-FileNotice: Part of the Woods addons.
 
-import freecad.Woods as module
-from importlib import resources
+import os
 
 
-materials = resources.files(module) / 'Resources/Materials'
-models = resources.files(module) / 'Resources/Models'
-icons = resources.files(module) / 'Resources/Icons'
+# Found with os.path, as this runs while FreeCAD starts and
+# importlib.resources is slow to import
+
+Folder = os.path.join(os.path.dirname(__file__),'Resources')
+
+materials = os.path.join(Folder,'Materials')
+models = os.path.join(Folder,'Models')
+icons = os.path.join(Folder,'Icons')
+previews = os.path.join(Folder,'Previews')
+pack = os.path.join(Folder,'Materials.zip')
+catalog = os.path.join(Folder,'Catalog.json')
+elasticity = os.path.join(Folder,'Elasticity.json')
+search = os.path.join(Folder,'Search.json')
 
 
 def asIcon ( name : str ):
 
     file = name + '.svg'
 
-    icon = icons / file
+    path = os.path.join(icons,file)
+
+    if os.path.isfile(path):
+        return path
+
+    # The addon is zipped
+
+    import freecad.Woods as module
+    from importlib import resources
+
+    icon = resources.files(module) / 'Resources/Icons' / file
 
     with resources.as_file(icon) as path:
-        return str( path )
\ No newline at end of file
+        return str( path )
@@ -0,0 +1,112 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+# SPDX-FileNotice: Part of the Woods addons.
+
+"""Fuzzy search of the woods by name, alias, species or range
+
+The trigram index is written by Utilities/spreadsheet.py. Names are
+compared without case, accents or punctuation, and the last word of a
+query matches any word it starts, so partial input finds its wood.
+
+    from freecad.Woods import Search
+
+    Search.search('Jatoba')         # [ UUID of Jatobá , ... ]
+"""
+
+import json
+import re
+import unicodedata
+from functools import lru_cache
+
+from .Resources import search as index
+
+
+# Ranking of a match by the field it was found in
+
+Weights = {
+    'name' : 1.0 ,
+    'alias' : 0.95 ,
+    'species' : 0.9 ,
+    'range' : 0.8 ,
+}
+
+
+@lru_cache( maxsize = 1 )
+def _load ():
+
+    with open(index,encoding = 'utf-8') as file:
+        data = json.load(file)
+
+    sizes = [ len(_trigrams(text)) for _ , _ , text in data[ 'terms' ] ]
+
+    return data[ 'materials' ] , data[ 'terms' ] , sizes , data[ 'trigrams' ]
+
+
+def normalize ( text : str ) -> str:
+
+    """Lower case words without accents or punctuation"""
+
+    text = unicodedata.normalize('NFKD',text)
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+
+    return ' '.join(re.sub(r'[^0-9a-z]+',' ',text).split())
+
+
+def _trigrams ( text : str , prefix : bool = False ) -> set[ str ]:
+
+    # Each word is padded with two spaces before and one after. Without
+    # the trailing space the last word only has to start a word
+
+    words = text.split()
+    trigrams = set()
+
+    for position , word in enumerate(words):
+        padded = '  ' + word
+
+        if not ( prefix and position == len(words) - 1 ):
+            padded += ' '
+
+        trigrams.update(padded[ i : i + 3 ] for i in range(len(padded) - 2))
+
+    return trigrams
+
+
+def search ( text : str , limit : int = 10 , threshold : float = 0.5 ) -> list[ str ]:
+
+    """
+    UUIDs of the materials best matching `text`, best first.
+
+    A material scores the share of the query trigrams found in its best
+    term, weighted by `Weights`. Ties go to the closer term length, then
+    catalog order. Materials scoring under `threshold` are left out.
+    """
+
+    materials , terms , sizes , postings = _load()
+
+    query = _trigrams(normalize(text),prefix = True)
+
+    if not query:
+        return []
+
+    common = {}
+
+    for trigram in query:
+        for term in postings.get(trigram,()):
+            common[ term ] = common.get(term,0) + 1
+
+    best = {}
+
+    for term , count in common.items():
+        material , field , _ = terms[ term ]
+        score = (
+            Weights[ field ] * count / len(query) ,
+            2 * count / ( len(query) + sizes[ term ] )
+        )
+        if score > best.get(material,( 0 , 0 )):
+            best[ material ] = score
+
+    ranked = sorted(
+        ( material for material , score in best.items() if score[ 0 ] >= threshold ) ,
+        key = lambda material : ( tuple( - value for value in best[ material ] ) , material )
+    )
+
+    return [ materials[ material ] for material in ranked[ : limit ] ]
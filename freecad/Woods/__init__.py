@@ -23,14 +23,45 @@
 #                                                                              #
 ################################################################################
 
-from .Resources import materials , models , asIcon
+import os
 from FreeCAD import ParamGet
 
+from .Resources import models , materials , pack , asIcon
+
 
 Parameter = 'User parameter:BaseApp/Preferences/Mod/Material/Resources/Modules/Woods'
 
 
+def _models () -> str:
+    return models
+
+
+def _materials () -> str:
+
+    if os.path.isdir(materials) or not os.path.isfile(pack):
+        return materials
+
+    from .Pack import directory
+    return directory()
+
+
+def _icon () -> str:
+    return asIcon('Logo')
+
+
+def register ( config ):
+
+    """Point the Material workbench at the addon, writing only what changed"""
+
+    for name , resolve in (
+        ( 'ModuleModelDir' , _models ) ,
+        ( 'ModuleDir' , _materials ) ,
+        ( 'ModuleIcon' , _icon ) ,
+    ):
+        value = resolve()
+        if config.GetString(name) != value:
+            config.SetString(name,value)
+
+
 config = ParamGet(Parameter)
-config.SetString('ModuleModelDir',str(models))
-config.SetString('ModuleDir',str(materials))
-config.SetString('ModuleIcon',asIcon('Logo'))
+register(config)